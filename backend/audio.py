@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from pathlib import Path
+from payloads import StaticPayload
+from services.cache import LRUCache
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from typing import Any, Dict, Optional, Tuple
+import anyio
+import json
+import os
+import re
+import unicodedata
+
+AUDIO_MEDIA_TYPE = "audio/mpeg"
+# Clips only change with a deploy, and a changed file gets a new ETag
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class AudioClip:
+    path: Path
+    size: int
+    etag: str
+    data: Optional[bytes] = None  # set for clips small enough to keep in memory
+    # Otherwise the file size and etag were taken from, left open for the response to send and close
+    file: Optional[anyio.AsyncFile] = None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single-range Range header.
+
+    None means "send the whole clip" (no header, or one we do not handle or
+    that is invalid, such as multiple ranges or last < first: RFC 9110 says to
+    ignore those); ValueError means the range is unsatisfiable, which every
+    range of an empty clip is.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first and last and int(last) < int(first):
+        return None
+    if size == 0:
+        raise ValueError("Unsatisfiable range")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class AudioFileResponse(Response):
+    """A byte range of a file on disk, sent with zero-copy sendfile when the server offers it."""
+
+    def __init__(self, clip: AudioClip, start: int, end: int, status_code: int, headers: Dict[str, str]):
+        super().__init__(status_code=status_code, headers=headers, media_type=AUDIO_MEDIA_TYPE)
+        self.clip = clip
+        self.start = start
+        self.count = end - start + 1
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions", {})
+        # The file the headers were computed from, so a clip replaced on disk meanwhile cannot mix in
+        async with self.clip.file as file:
+            if "http.response.zerocopysend" in extensions:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.wrapped.fileno(),
+                    "offset": self.start,
+                    "count": self.count,
+                    "more_body": False,
+                })
+                return
+            await file.seek(self.start)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # Truncated in place since it was stat'ed; end the response anyway
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class AudioLibrary:
+    """MP3 clips in a local directory: <grapheme>.mp3, words/<phonetic word>.mp3 and sprite/.
+
+    Clips up to max_file_bytes are kept (bytes, size and ETag together) in an
+    LRU of the hottest max_clips, so repeat requests are served from memory
+    without touching the filesystem. Size and ETag always come from fstat of
+    the open file the bytes are read from, so they cannot describe an older
+    version of a clip than the bytes sent.
+    """
+
+    def __init__(self, directory: str, max_clips: int = 128, max_file_bytes: int = 256 * 1024):
+        self.directory = Path(directory)
+        self.max_file_bytes = max_file_bytes
+        self.clips = LRUCache(maxsize=max_clips)
+        self._manifest: Optional[Tuple[int, StaticPayload]] = None
+
+    def path_for(self, name: str, word: bool = False) -> Path:
+        # Callers pass only known graphemes/words, so there is no traversal; file names are NFC
+        filename = unicodedata.normalize("NFC", name) + ".mp3"
+        return self.directory / "words" / filename if word else self.directory / filename
+
+    async def get(self, name: str, word: bool = False) -> Optional[AudioClip]:
+        return await self._load(f"word:{name}" if word else name, self.path_for(name, word))
+
+    async def get_sprite(self, version: str) -> Optional[AudioClip]:
+        if not version.isalnum():
+            return None
+        return await self._load(f"sprite:{version}", self.directory / "sprite" / f"sprite-{version}.mp3")
+
+    async def sprite_manifest(self) -> Optional[StaticPayload]:
+        """The manifest written by `manage.py build-audio-sprite`, pre-serialized; None before the first build."""
+        path = self.directory / "sprite" / "manifest.json"
+        try:
+            stat = await anyio.Path(path).stat()
+        except FileNotFoundError:
+            return None
+        # Re-read only when a new build replaced the file
+        if self._manifest is None or self._manifest[0] != stat.st_mtime_ns:
+            manifest = json.loads(await anyio.Path(path).read_text(encoding="utf-8"))
+            self._manifest = (stat.st_mtime_ns, StaticPayload(manifest, max_age=300, version=manifest.get("version")))
+        return self._manifest[1]
+
+    async def _load(self, key: str, path: Path) -> Optional[AudioClip]:
+        clip = self.clips.get(key)
+        if clip is not None:
+            return clip
+        try:
+            file = await anyio.open_file(path, "rb")
+        except FileNotFoundError:
+            return None
+        stat = os.fstat(file.wrapped.fileno())
+        clip = AudioClip(path=path, size=stat.st_size, etag=f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"')
+        if clip.size > self.max_file_bytes:
+            clip.file = file
+            return clip
+        async with file:
+            clip.data = await file.read(clip.size)
+        self.clips.put(key, clip)
+        return clip
+
+    def stats(self) -> Dict[str, Any]:
+        return self.clips.stats()
+
+
+def audio_response(clip: AudioClip, if_none_match: Optional[str], range_header: Optional[str],
+                   if_range: Optional[str]) -> Response:
+    headers = {
+        "ETag": clip.etag,
+        "Cache-Control": AUDIO_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    # A clip served from disk brings its open file; responses without a body close it
+    close = BackgroundTask(clip.file.aclose) if clip.file is not None else None
+    if if_none_match and (if_none_match.strip() == "*" or clip.etag in {t.strip().removeprefix("W/") for t in if_none_match.split(",")}):
+        return Response(status_code=304, headers=headers, background=close)
+    # If-Range with a different validator: the client's partial copy is stale, send everything
+    if if_range and if_range.strip() != clip.etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, clip.size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{clip.size}"}, background=close)
+    status_code = 200
+    start, end = 0, clip.size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{clip.size}"
+    if clip.data is not None:
+        body = clip.data if status_code == 200 else clip.data[start:end + 1]
+        return Response(content=body, status_code=status_code, headers=headers, media_type=AUDIO_MEDIA_TYPE)
+    return AudioFileResponse(clip, start, end, status_code, headers)
+
+
+def default_audio_dir() -> str:
+    return os.environ.get("AUDIO_DIR", str(Path(__file__).parent / "static" / "audio"))
@@ -0,0 +1,149 @@
+"""Audio sprite: every grapheme and phonetic-word clip packed into one MP3.
+
+MPEG audio frames are self-contained, so clips can be concatenated frame by
+frame. ID3 tags and Xing/Info/VBRI header frames are dropped; the manifest
+records each clip's byte range and its start/duration in seconds, computed
+from the frame headers.
+"""
+from audio import AudioLibrary
+from models import FOREIGN_GRAPHEMES, HUNGARIAN_GRAPHEMES, PHONEME_MAP_HU
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SPRITE_DIR_NAME = "sprite"
+MANIFEST_NAME = "manifest.json"
+
+# Bitrates in kbps by (MPEG-1?, layer)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by the 2-bit version field (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+_VBR_TAGS = (b"Xing", b"Info", b"VBRI")
+
+
+class MP3Frame(NamedTuple):
+    length: int
+    samples: int
+    sample_rate: int
+
+
+def parse_frame_header(header: bytes) -> Optional[MP3Frame]:
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = header[1] >> 3 & 3
+    layer = 4 - (header[1] >> 1 & 3)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = header[2] >> 2 & 3
+    padding = header[2] >> 1 & 1
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        # Reserved values, or free-format bitrate (no fixed frame length)
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if layer == 1:
+        return MP3Frame((12 * bitrate // sample_rate + padding) * 4, 384, sample_rate)
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return MP3Frame(samples // 8 * bitrate // sample_rate + padding, samples, sample_rate)
+
+
+def _audio_start(data: bytes) -> int:
+    # Skip an ID3v2 tag (10-byte header with a syncsafe size, optional footer)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        return 10 + size + (10 if data[5] & 0x10 else 0)
+    return 0
+
+
+def mp3_frames(data: bytes) -> Tuple[bytes, float]:
+    """The audio frames of an MP3 file (tags and VBR header frame removed) and their duration in seconds."""
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    position = _audio_start(data)
+    frames: List[bytes] = []
+    duration = 0.0
+    while position + 4 <= end:
+        frame = parse_frame_header(data[position:position + 4])
+        if frame is None:
+            # Resynchronize on the next frame sync
+            position += 1
+            continue
+        chunk = data[position:position + frame.length]
+        if len(chunk) < frame.length:
+            break
+        if not frames and any(tag in chunk[:64] for tag in _VBR_TAGS):
+            # Encoder metadata frame: silent, and its counts would be wrong inside a sprite
+            position += frame.length
+            continue
+        frames.append(chunk)
+        duration += frame.samples / frame.sample_rate
+        position += frame.length
+    return b"".join(frames), duration
+
+
+def sprite_clips() -> List[Tuple[str, str, bool]]:
+    """(section, name, is_word) for every clip in the sprite, straight from the grapheme tables."""
+    clips = [("graphemes", g, False) for g in HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES]
+    words = dict.fromkeys(PHONEME_MAP_HU[g] for g in HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES if PHONEME_MAP_HU.get(g))
+    clips.extend(("words", word, True) for word in words)
+    return clips
+
+
+def build_sprite(audio_dir: str) -> Dict[str, Any]:
+    """Write <audio_dir>/sprite/sprite-<version>.mp3 and manifest.json; returns the manifest."""
+    library = AudioLibrary(audio_dir)
+    sprite = bytearray()
+    sections: Dict[str, Dict[str, Dict[str, Any]]] = {"graphemes": {}, "words": {}}
+    missing: List[str] = []
+    start = 0.0
+    for section, name, is_word in sprite_clips():
+        path = library.path_for(name, word=is_word)
+        if not path.is_file():
+            missing.append(f"{section}/{name}")
+            continue
+        frames, duration = mp3_frames(path.read_bytes())
+        if not frames:
+            logger.warning(f"No MPEG audio frames in {path}")
+            missing.append(f"{section}/{name}")
+            continue
+        sections[section][name] = {
+            "offset": len(sprite),
+            "length": len(frames),
+            "start": round(start, 6),
+            "duration": round(duration, 6),
+        }
+        sprite += frames
+        start += duration
+
+    version = hashlib.sha256(sprite).hexdigest()[:16]
+    out_dir = Path(audio_dir) / SPRITE_DIR_NAME
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "version": version,
+        "url": f"/api/game/audio-sprite/{version}.mp3",
+        "size": len(sprite),
+        "duration": round(start, 6),
+        "words_by_grapheme": {
+            g: PHONEME_MAP_HU[g] for g in HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES
+            if PHONEME_MAP_HU.get(g) in sections["words"]
+        },
+        **sections,
+        "missing": missing,
+    }
+    (out_dir / f"sprite-{version}.mp3").write_bytes(bytes(sprite))
+    # Written last, so a manifest never points at a sprite that is not there yet
+    manifest_path = out_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path.replace(manifest_path)
+    return manifest
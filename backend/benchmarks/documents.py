@@ -0,0 +1,50 @@
+"""CPU cost of one list page from stored documents to response body: models vs trusted documents.
+
+Run from the backend directory: python -m benchmarks.documents [--children N] [--rounds N]
+
+"validated" builds every model from its document and serializes the models
+(the list routes before documents.py, or VALIDATE_ON_READ=true); "trusted"
+normalizes the documents and serializes them with orjson.
+"""
+from benchmarks.serialization import sample_children, sample_stickers
+from documents import document_reader
+from models import Child, Sticker
+from responses import FastJSONResponse, ModelResponse
+from typing import List
+import argparse
+import json
+import time
+
+
+def _time(fn, rounds: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--children", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    cases = {
+        f"{args.children} children x 40 progress": (Child, [c.model_dump() for c in sample_children(args.children)]),
+        f"{args.children} stickers": (Sticker, [s.model_dump() for s in sample_stickers(args.children)]),
+    }
+    print(f"{'milliseconds per page':<36}{'validated':>11}{'trusted':>9}{'speedup':>9}")
+    for name, (model, documents) in cases.items():
+        read = document_reader(model)
+        variants = {
+            "validated": lambda: ModelResponse([model(**d) for d in documents], List[model]).body,
+            "trusted": lambda: FastJSONResponse([read(d) for d in documents]).body,
+        }
+        # Same document either way
+        assert len({json.dumps(json.loads(body()), sort_keys=True) for body in variants.values()}) == 1
+        timings = {variant: _time(body, args.rounds) for variant, body in variants.items()}
+        print(f"{name:<36}{timings['validated']:>11.2f}{timings['trusted']:>9.2f}{timings['validated'] / timings['trusted']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
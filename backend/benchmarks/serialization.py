@@ -0,0 +1,112 @@
+"""Response serialization cost of the hot routes, with response_model and as the routes do it now.
+
+Run from the backend directory: python -m benchmarks.serialization [--rounds N]
+
+"response_model" is what FastAPI does for a route with response_model=...
+(dump, re-validate, jsonable_encoder, json.dumps); "orjson" is the same with
+the app's default ORJSONResponse; "route" is what the route runs: the list
+routes normalize the stored documents (documents.py) into a FastJSONResponse,
+record_progress returns a responses.ModelResponse.
+"""
+from datetime import datetime, timedelta
+from documents import document_reader
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from graphemes import FOREIGN_GRAPHEMES, HUNGARIAN_GRAPHEMES
+from models import Child, GraphemeProgress, ProgressUpdateResponse, Sticker
+from responses import FastJSONResponse, ModelResponse
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import time
+
+
+def sample_children(count: int) -> List[Child]:
+    graphemes = HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES
+    return [
+        Child(
+            name=f"Gyerek {i}",
+            streak=i % 7,
+            total_stickers=i % 13,
+            progress={
+                g: GraphemeProgress(stars=j % 4, attempts=10 + j, correct=5 + j // 2, timed_attempts=8, response_time_sum=12000)
+                for j, g in enumerate(graphemes[:40])
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def sample_stickers(count: int) -> List[Sticker]:
+    start = datetime(2025, 1, 1)
+    return [
+        Sticker(child_id="c", catalog_id=i % 30, name=f"Matrica {i}", emoji="⭐", streak_level=3,
+                description="Szép munka!", earned_at=start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+async def _response_model_body(content: Any, response_type: Any, response_class) -> bytes:
+    field = create_response_field(name="Response", type_=response_type)
+    serialized = await serialize_response(field=field, response_content=content, is_coroutine=True)
+    return response_class(serialized).body
+
+
+def _time(fn: Callable[[], Any], rounds: int) -> float:
+    fn()  # warm up (type adapters, schema caches)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def _stored_list_body(model, documents: List[Dict[str, Any]]) -> Callable[[], bytes]:
+    # get_children / get_child_stickers: stored documents, normalized, straight to orjson
+    read = document_reader(model)
+    return lambda: FastJSONResponse([read(document) for document in documents]).body
+
+
+def run(rounds: int) -> Dict[str, Dict[str, float]]:
+    children, stickers = sample_children(100), sample_stickers(100)
+    progress = ProgressUpdateResponse(new_streak=5, new_stars=2, sticker_earned=sample_stickers(1)[0], total_stickers=4)
+    cases = {
+        "get_children (100 x 40 progress)": (
+            children, List[Child], _stored_list_body(Child, [c.model_dump() for c in children])),
+        "get_child_stickers (100)": (
+            stickers, List[Sticker], _stored_list_body(Sticker, [s.model_dump() for s in stickers])),
+        "record_progress": (
+            progress, ProgressUpdateResponse, lambda: ModelResponse(progress, ProgressUpdateResponse).body),
+    }
+    loop = asyncio.new_event_loop()
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for name, (content, response_type, route_body) in cases.items():
+            bodies = {
+                "response_model": lambda: loop.run_until_complete(_response_model_body(content, response_type, JSONResponse)),
+                "orjson": lambda: loop.run_until_complete(_response_model_body(content, response_type, FastJSONResponse)),
+                "route": route_body,
+            }
+            # Same document either way
+            decoded = {json.dumps(json.loads(body()), sort_keys=True) for body in bodies.values()}
+            assert len(decoded) == 1, f"{name}: serializations differ"
+            results[name] = {variant: round(_time(body, rounds), 1) for variant, body in bodies.items()}
+    finally:
+        loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    results = run(args.rounds)
+    print(f"{'microseconds per response':<36}{'response_model':>16}{'orjson':>10}{'route':>10}{'speedup':>9}")
+    for name, timings in results.items():
+        speedup = timings["response_model"] / timings["route"]
+        print(f"{name:<36}{timings['response_model']:>16}{timings['orjson']:>10}{timings['route']:>10}{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
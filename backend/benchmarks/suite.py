@@ -0,0 +1,300 @@
+"""In-process benchmarks of the ChildService hot paths, through the service and through the app.
+
+Run from the backend directory:
+
+    python -m benchmarks.suite                                  # in-memory Motor stand-in (mongomock-motor)
+    python -m benchmarks.suite --mongo-url mongodb://localhost  # a local mongod, in a throwaway database
+    python -m benchmarks.suite --output after.json --compare before.json
+
+Every scenario is measured on the service object ("service") and as an HTTP
+request to the FastAPI app over the ASGI transport ("http"), with no server
+or network in between. Results (ops/sec and p50/p95/p99 latency) are printed
+and, with --output, written as JSON together with the commit they were taken
+at, so two runs can be compared with --compare.
+
+The in-memory stand-in has no $bit/$bitsAnySet, so the sticker-award
+scenario only runs against mongod. It also copies every document it returns,
+so the 10000-children listing is slow there; --max-children 1000 skips it.
+"""
+from datetime import datetime, timedelta
+from graphemes import FOREIGN_GRAPHEMES, HUNGARIAN_GRAPHEMES, get_random_graphemes
+from indexes import ensure_indexes
+from models import Child, ChildSettings, GameMode, GameSessionCreate, GraphemeProgress, Sticker
+from services.cache import LRUCache
+from services.child_service import ChildService
+from services.session_writer import SessionWriteBuffer
+from sticker_catalog import STICKER_CATALOG
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import httpx
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+
+Operation = Callable[[int], Awaitable[Any]]
+
+CHILD_COUNTS = (10, 1000, 10000)
+# server.py logs at INFO, and httpx logs every request at INFO: both would bury the results
+QUIET_LOGGERS = ("httpx", "server", "indexes", "services")
+STICKER_COUNTS = (10, 1000)
+
+
+class Bench:
+    """One database, service and in-process app client for the whole run."""
+
+    def __init__(self, db, in_memory: bool, session_buffer: bool):
+        self.db = db
+        self.in_memory = in_memory
+        self.session_buffer = session_buffer
+        self.service: Optional[ChildService] = None
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def reset(self):
+        """Empty collections and a fresh service (caches, write buffer), configured like server.py."""
+        if self.service is not None and self.service.session_writer is not None:
+            await self.service.session_writer.stop()
+        for name in await self.db.list_collection_names():
+            await self.db[name].delete_many({})
+        await ensure_indexes(self.db)
+        session_writer = None
+        if self.session_buffer:
+            session_writer = SessionWriteBuffer(self.db.game_sessions, rollup_collection=self.db.session_rollups)
+            session_writer.start()
+        self.service = ChildService(self.db, session_writer=session_writer, child_cache=LRUCache(maxsize=10000, ttl=30))
+
+        # Routes only reach the database through app.state.child_service
+        import server
+        server.app.state.child_service = self.service
+        server.app.state.session_writer = session_writer
+        if self.client is None:
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench")
+
+    async def close(self):
+        if self.service is not None and self.service.session_writer is not None:
+            await self.service.session_writer.stop()
+        if self.client is not None:
+            await self.client.aclose()
+
+
+async def _ok(request: Awaitable[httpx.Response]) -> httpx.Response:
+    response = await request
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+def _child_document(index: int, created_at: datetime) -> Dict[str, Any]:
+    graphemes = HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES
+    progress = {
+        g: GraphemeProgress(stars=j % 4, attempts=10 + j, correct=5 + j // 2, recent=0b1011011011, recent_count=10)
+        for j, g in enumerate(graphemes[:40])
+    }
+    child = Child(name=f"Gyerek {index}", streak=index % 7, progress=progress, created_at=created_at, updated_at=created_at)
+    return child.model_dump()
+
+
+async def seed_children(bench: Bench, count: int):
+    start = datetime(2025, 1, 1)
+    existing = await bench.db.children.count_documents({})
+    documents = [_child_document(i, start + timedelta(seconds=i)) for i in range(existing, count)]
+    for i in range(0, len(documents), 1000):
+        await bench.db.children.insert_many(documents[i:i + 1000])
+
+
+async def seed_stickers(bench: Bench, child_id: str, count: int):
+    start = datetime(2025, 1, 1)
+    existing = await bench.db.stickers.count_documents({"child_id": child_id})
+    catalog = [STICKER_CATALOG[i % len(STICKER_CATALOG)] for i in range(existing, count)]
+    documents = [
+        Sticker(child_id=child_id, catalog_id=sticker.id, name=sticker.name, emoji=sticker.emoji, description=sticker.desc,
+                streak_level=3, earned_at=start + timedelta(minutes=i)).model_dump()
+        for i, sticker in enumerate(catalog, start=existing)
+    ]
+    if documents:
+        await bench.db.stickers.insert_many(documents)
+    await bench.db.children.update_one({"id": child_id}, {"$set": {"total_stickers": count}})
+
+
+async def new_child(bench: Bench, settings: ChildSettings) -> str:
+    child = Child(name="Mérő", settings=settings)
+    await bench.db.children.insert_one(child.model_dump())
+    return child.id
+
+
+def _answer(i: int) -> GameSessionCreate:
+    graphemes = HUNGARIAN_GRAPHEMES
+    # Mostly correct, so streaks build up like in a real session
+    return GameSessionCreate(grapheme=graphemes[i % len(graphemes)], is_correct=i % 5 != 4,
+                             game_mode=GameMode.FIND_LETTER, response_time=800 + i % 700)
+
+
+def _answer_body(i: int) -> Dict[str, Any]:
+    return _answer(i).model_dump(mode="json")
+
+
+async def measure(operation: Operation, iterations: int, warmup: int) -> Dict[str, Any]:
+    for i in range(warmup):
+        await operation(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(warmup, warmup + iterations):
+        op_started = time.perf_counter()
+        await operation(i)
+        latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1e3, 3),
+        "p50_ms": round(percentiles[49] * 1e3, 3),
+        "p95_ms": round(percentiles[94] * 1e3, 3),
+        "p99_ms": round(percentiles[98] * 1e3, 3),
+    }
+
+
+async def run_scenarios(bench: Bench, iterations: int, warmup: int, max_children: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+
+    async def record(name: str, layer: str, operation: Operation, **params):
+        result = await measure(operation, iterations, warmup)
+        results.append({"scenario": name, "layer": layer, "params": params, **result})
+        print(f"  {name:<34}{layer:<8}{result['ops_per_sec']:>10}/s  p50 {result['p50_ms']:>8} ms  "
+              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms")
+
+    def skipped(name: str, reason: str):
+        results.append({"scenario": name, "skipped": reason})
+        print(f"  {name:<34}skipped: {reason}")
+
+    # record_game_session, without and with a sticker on every correct answer
+    await bench.reset()
+    quiet = await new_child(bench, ChildSettings(stickers_enabled=False))
+    await record("record_game_session", "service", lambda i: bench.service.record_game_session(quiet, _answer(i)), stickers=False)
+    await record("record_game_session", "http",
+                 lambda i: _ok(bench.client.post(f"/api/children/{quiet}/progress", json=_answer_body(i))), stickers=False)
+    if bench.in_memory:
+        skipped("record_game_session (stickers)", "the in-memory stand-in does not implement $bit/$bitsAnySet")
+    else:
+        generous = await new_child(bench, ChildSettings(streak_thresholds=list(range(1, 10)), additional_sticker_interval=1))
+        always_correct = lambda i: GameSessionCreate(grapheme="a", is_correct=True, game_mode=GameMode.FIND_LETTER, response_time=900)
+        await record("record_game_session (stickers)", "service",
+                     lambda i: bench.service.record_game_session(generous, always_correct(i)), stickers=True)
+        await record("record_game_session (stickers)", "http",
+                     lambda i: _ok(bench.client.post(f"/api/children/{generous}/progress", json=always_correct(i).model_dump(mode="json"))),
+                     stickers=True)
+
+    # get_children: first page (default size) out of 10 / 1k / 10k children with ~40 progress entries each
+    await bench.reset()
+    for count in CHILD_COUNTS:
+        if count > max_children:
+            skipped(f"get_children ({count})", f"over --max-children {max_children}")
+            continue
+        await seed_children(bench, count)
+        await record(f"get_children ({count})", "service", lambda i: bench.service.get_children(), children=count)
+        await record(f"get_children ({count})", "http", lambda i: _ok(bench.client.get("/api/children/")), children=count)
+
+    # get_child_stickers: first page of a child with 10 / 1k stickers
+    await bench.reset()
+    collector = await new_child(bench, ChildSettings())
+    for count in STICKER_COUNTS:
+        await seed_stickers(bench, collector, count)
+        await record(f"get_child_stickers ({count})", "service", lambda i: bench.service.get_child_stickers(collector), stickers=count)
+        await record(f"get_child_stickers ({count})", "http",
+                     lambda i: _ok(bench.client.get(f"/api/children/{collector}/stickers")), stickers=count)
+
+    # get_random_graphemes: one round of 9
+    async def sample(i: int):
+        return get_random_graphemes(9)
+
+    await record("get_random_graphemes", "service", sample, count=9)
+    await record("get_random_graphemes", "http", lambda i: _ok(bench.client.get("/api/game/graphemes/random?count=9")), count=9)
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]):
+    """Print the ops/sec and p95 change of every scenario also present in baseline."""
+    before = {(r["scenario"], r["layer"]): r for r in baseline["results"] if "skipped" not in r}
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    for result in results:
+        old = before.get((result["scenario"], result.get("layer")))
+        if "skipped" in result or old is None:
+            continue
+        ops_change = (result["ops_per_sec"] / old["ops_per_sec"] - 1) * 100
+        p95_change = (result["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+        print(f"  {result['scenario']:<34}{result['layer']:<8}ops/s {ops_change:+7.1f}%   p95 {p95_change:+7.1f}%")
+
+
+async def main_async(args) -> Dict[str, Any]:
+    db_name = f"betukereso_bench_{uuid.uuid4().hex[:8]}"
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("The in-memory backend needs mongomock-motor (pip install mongomock-motor), or pass --mongo-url")
+        client = AsyncMongoMockClient()
+    bench = Bench(client[db_name], in_memory=not args.mongo_url, session_buffer=not args.no_session_buffer)
+    backend = "mongod" if args.mongo_url else "in-memory"
+    print(f"Benchmarking against {backend} ({db_name}), {args.iterations} iterations after {args.warmup} warm-up")
+    try:
+        results = await run_scenarios(bench, args.iterations, args.warmup, args.max_children)
+    finally:
+        await bench.close()
+        await client.drop_database(db_name)
+        client.close()
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "backend": backend,
+            "session_buffer": not args.no_session_buffer,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL"),
+                        help="Benchmark against this mongod (a throwaway database is created and dropped); default: in-memory")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--max-children", type=int, default=max(CHILD_COUNTS), help="Skip get_children sizes above this")
+    parser.add_argument("--no-session-buffer", action="store_true", help="Write game_sessions inline instead of write-behind")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="A previous --output file to compare with")
+    args = parser.parse_args()
+
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    report = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            compare(report["results"], json.load(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from typing import Any, Dict
+import asyncio
+import os
+import threading
+import time
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool telemetry collected from pymongo's CMAP events.
+
+    Motor runs pymongo operations on executor threads, so check-out start and
+    finish happen on the same thread and the wait time is tracked thread-locally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.wait_time_total_ms = 0.0
+        self.wait_time_max_ms = 0.0
+
+    def _record_wait(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        if started is None:
+            return 0.0
+        waited_ms = (time.perf_counter() - started) * 1000
+        self.wait_time_total_ms += waited_ms
+        self.wait_time_max_ms = max(self.wait_time_max_ms, waited_ms)
+        return waited_ms
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait()
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self._record_wait()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "available": max(0, self.open_connections - self.checked_out),
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "wait_time_avg_ms": round(self.wait_time_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max_ms, 3),
+            }
+
+
+class MongoConnection:
+    """Process-wide Mongo client owned by the app lifespan (see server.py)."""
+
+    def __init__(self, mongo_url: str, db_name: str, min_pool_size: int = 5, max_pool_size: int = 100,
+                 max_idle_time_ms: int = 300000, wait_queue_timeout_ms: int = 5000):
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.pool_monitor = PoolMonitor()
+        self.client = AsyncIOMotorClient(
+            mongo_url,
+            minPoolSize=min_pool_size,
+            maxPoolSize=max_pool_size,
+            maxIdleTimeMS=max_idle_time_ms,
+            waitQueueTimeoutMS=wait_queue_timeout_ms,
+            event_listeners=[self.pool_monitor],
+        )
+        self.db: AsyncIOMotorDatabase = self.client[db_name]
+
+    @classmethod
+    def from_env(cls) -> "MongoConnection":
+        return cls(
+            mongo_url=os.environ['MONGO_URL'],
+            db_name=os.environ.get('DB_NAME', 'betukkereso'),
+            min_pool_size=int(os.environ.get('MONGO_MIN_POOL_SIZE', 5)),
+            max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+            max_idle_time_ms=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+            wait_queue_timeout_ms=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+        )
+
+    async def warm_up(self):
+        # Concurrent pings force the pool to open min_pool_size connections before the first request
+        await asyncio.gather(*(self.db.command("ping") for _ in range(max(1, self.min_pool_size))))
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = self.pool_monitor.snapshot()
+        stats["min_pool_size"] = self.min_pool_size
+        stats["max_pool_size"] = self.max_pool_size
+        return stats
+
+    def close(self):
+        self.client.close()
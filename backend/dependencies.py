@@ -0,0 +1,27 @@
+from audio import AudioLibrary
+from fastapi import Header, HTTPException, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.child_service import ChildService
+from typing import Optional
+import hmac
+import os
+
+# Dependency to get database (shared client created at startup in server.py)
+def get_db(request: Request) -> AsyncIOMotorDatabase:
+    return request.app.state.mongo.db
+
+# Dependency to get the singleton child service
+def get_child_service(request: Request) -> ChildService:
+    return request.app.state.child_service
+
+# Dependency to get the audio clip library (created at startup in server.py)
+def get_audio_library(request: Request) -> AudioLibrary:
+    return request.app.state.audio
+
+# Admin endpoints are closed unless ADMIN_TOKEN is configured and sent as X-Admin-Token
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    expected = os.environ.get('ADMIN_TOKEN')
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not hmac.compare_digest(x_admin_token or "", expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,83 @@
+"""Stored documents as response data, without building and validating models.
+
+Everything in the children and stickers collections went through the models
+on the way in, so list endpoints can return the documents themselves: a
+document is only rebuilt when its keys differ from the model's fields
+(missing defaults are filled in, unknown keys dropped), recursively for
+nested models and dicts/lists of them. Enums are stored as their values, so
+the result serializes (orjson) to what the model would have produced.
+
+With validate set (VALIDATE_ON_READ, server.py) every document goes through
+the model instead, e.g. while a migration may have left documents that need
+coercing. Note that pydantic-core validation is faster than model_construct
+in Python, so a constructed-model path would not help here.
+"""
+from functools import lru_cache
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Mapping, Optional, Type, Union, get_args, get_origin
+
+Normalizer = Callable[[Any], Any]
+
+
+def _default(field) -> Any:
+    value = field.get_default(call_default_factory=True)
+    return value.model_dump() if isinstance(value, BaseModel) else value
+
+
+def _normalizer(annotation: Any) -> Optional[Normalizer]:
+    """Normalizer for a stored value of this type; None when it is returned as stored."""
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        inner = [arg for arg in args if arg is not type(None)]
+        normalize = _normalizer(inner[0]) if len(inner) == 1 else None
+        return None if normalize is None else lambda value: None if value is None else normalize(value)
+    if origin in (dict, Dict) and args:
+        normalize = _normalizer(args[1])
+        if normalize is None:
+            return None
+
+        def normalize_dict(value: Dict[str, Any]) -> Dict[str, Any]:
+            for key, item in value.items():
+                normalized = normalize(item)
+                if normalized is not item:
+                    value[key] = normalized
+            return value
+
+        return normalize_dict
+    if origin in (list, List) and args:
+        normalize = _normalizer(args[0])
+        return None if normalize is None else lambda value: [normalize(item) for item in value]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _document_normalizer(annotation)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _document_normalizer(model: Type[BaseModel]) -> Normalizer:
+    fields = model.model_fields
+    names = frozenset(fields)
+    nested = {name: n for name, field in fields.items() if (n := _normalizer(field.annotation)) is not None}
+
+    def normalize(document: Dict[str, Any]) -> Dict[str, Any]:
+        if document.keys() != names:
+            document = {name: document[name] if name in document else _default(field) for name, field in fields.items()}
+        for name, normalize_field in nested.items():
+            value = document[name]
+            normalized = normalize_field(value)
+            if normalized is not value:
+                document[name] = normalized
+        return document
+
+    return normalize
+
+
+def document_reader(model: Type[BaseModel], validate: bool = False) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    """Stored document -> dict with exactly the model's fields, trusted or validated."""
+    if validate:
+        return lambda document: model.model_validate(document).model_dump()
+    return _document_normalizer(model)
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Projection of the model's fields, so trusted reads normally keep documents as they are."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
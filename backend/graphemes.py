@@ -0,0 +1,105 @@
+from models import HUNGARIAN_GRAPHEMES, FOREIGN_GRAPHEMES, PHONEME_MAP_HU, TROUBLE_GRAPHEMES
+from typing import Dict, List, NamedTuple, Tuple
+import numpy as np
+import random
+
+# Reference data for the game screens; static, so built once at import
+GRAPHEME_INFO: List[Dict[str, str]] = [
+    {
+        "grapheme": grapheme,
+        "phonetic_word": PHONEME_MAP_HU.get(grapheme, ""),
+        "audio_url": f"/api/game/audio/{grapheme}"
+    }
+    for grapheme in HUNGARIAN_GRAPHEMES
+]
+
+# Display forms; titlecase only capitalizes the first letter of a digraph ("Cs", "Dzs")
+GRAPHEME_VARIANTS: Dict[str, Dict[str, str]] = {
+    grapheme: {
+        "lowercase": grapheme,
+        "uppercase": grapheme.upper(),
+        "titlecase": grapheme[:1].upper() + grapheme[1:],
+    }
+    for grapheme in HUNGARIAN_GRAPHEMES + FOREIGN_GRAPHEMES
+}
+
+# Each rare grapheme is left out of a round with probability 1/2
+RARE_GRAPHEMES = ("dz", "dzs", "w")
+
+class GraphemePool(NamedTuple):
+    graphemes: Tuple[str, ...]
+    trouble: Tuple[int, ...]  # indices of TROUBLE_GRAPHEMES within graphemes
+    array: np.ndarray
+
+def _build_pool(include_foreign: bool, rare_mask: int) -> GraphemePool:
+    # Bit i of rare_mask drops RARE_GRAPHEMES[i]
+    dropped = {rare for i, rare in enumerate(RARE_GRAPHEMES) if rare_mask >> i & 1}
+    source = HUNGARIAN_GRAPHEMES + (FOREIGN_GRAPHEMES if include_foreign else [])
+    graphemes = tuple(g for g in source if g not in dropped)
+    trouble = tuple(i for i, g in enumerate(graphemes) if g in TROUBLE_GRAPHEMES)
+    return GraphemePool(graphemes, trouble, np.array(graphemes, dtype=object))
+
+# Every (include_foreign, rare-letter mask) combination, built once
+POOLS: Dict[bool, Tuple[GraphemePool, ...]] = {
+    include_foreign: tuple(_build_pool(include_foreign, mask) for mask in range(1 << len(RARE_GRAPHEMES)))
+    for include_foreign in (False, True)
+}
+
+_np_rng = np.random.default_rng()
+
+def get_random_graphemes(count: int, include_foreign: bool = False, trouble_bias: bool = True) -> List[str]:
+    """One round of distinct graphemes.
+
+    With trouble_bias one trouble grapheme is always included; the rest are
+    drawn uniformly from the remaining pool (and may include more of them).
+    """
+    pool = POOLS[include_foreign][random.getrandbits(len(RARE_GRAPHEMES))]
+    graphemes = pool.graphemes
+    size = len(graphemes)
+    max_count = min(count, size)
+    if trouble_bias and pool.trouble and max_count > 0:
+        forced = random.choice(pool.trouble)
+        # Sample indices of the pool without the forced one, then shift past it
+        picked = [forced] + [i + (i >= forced) for i in random.sample(range(size - 1), max_count - 1)]
+        random.shuffle(picked)
+        return [graphemes[i] for i in picked]
+    return [graphemes[i] for i in random.sample(range(size), max_count)]
+
+def get_distractors(target: str, count: int, include_foreign: bool = False) -> List[str]:
+    """count distinct graphemes other than target, from a pool drawn like get_random_graphemes."""
+    pool = POOLS[include_foreign][random.getrandbits(len(RARE_GRAPHEMES))]
+    graphemes = pool.graphemes
+    if target not in graphemes:
+        return [graphemes[i] for i in random.sample(range(len(graphemes)), min(count, len(graphemes)))]
+    skip = graphemes.index(target)
+    size = len(graphemes) - 1
+    return [graphemes[i + (i >= skip)] for i in random.sample(range(size), min(count, size))]
+
+def get_random_grapheme_sets(sets: int, count: int, include_foreign: bool = False, trouble_bias: bool = True) -> List[List[str]]:
+    """Many rounds at once, with the same distribution as get_random_graphemes.
+
+    Rounds are grouped by rare-letter mask; within a group every round is the
+    first max_count positions of a random permutation (argsort of uniform keys),
+    with the forced trouble grapheme's key pinned below all others.
+    """
+    rng = _np_rng
+    masks = rng.integers(0, 1 << len(RARE_GRAPHEMES), size=sets)
+    result: List[List[str]] = [[] for _ in range(sets)]
+    for mask in np.unique(masks):
+        rows = np.flatnonzero(masks == mask)
+        pool = POOLS[include_foreign][mask]
+        size = len(pool.graphemes)
+        max_count = min(count, size)
+        keys = rng.random((len(rows), size))
+        forced = bool(trouble_bias and pool.trouble and max_count > 0)
+        if forced:
+            choices = rng.choice(np.array(pool.trouble), size=len(rows))
+            keys[np.arange(len(rows)), choices] = -1.0
+        picked = np.argsort(keys, axis=1)[:, :max_count]
+        if forced:
+            # The forced grapheme sits first; shuffle each round's order
+            order = np.argsort(rng.random((len(rows), max_count)), axis=1)
+            picked = np.take_along_axis(picked, order, axis=1)
+        for row, graphemes in zip(rows.tolist(), pool.array[picked].tolist()):
+            result[row] = graphemes
+    return result
@@ -0,0 +1,122 @@
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Any, Dict, Iterator, List
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every index the services rely on; created idempotently at startup (server.py)
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "children": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "game_sessions": [
+        IndexModel([("child_id", ASCENDING), ("timestamp", ASCENDING)], name="child_id_timestamp"),
+    ],
+    "session_archive": [
+        IndexModel([("child_id", ASCENDING), ("month", ASCENDING)], name="child_id_month", unique=True),
+    ],
+    "session_rollups": [
+        IndexModel(
+            [("child_id", ASCENDING), ("day", ASCENDING), ("grapheme", ASCENDING), ("game_mode", ASCENDING), ("source", ASCENDING)],
+            name="child_id_day_key",
+            unique=True,
+        ),
+    ],
+    "stickers": [
+        IndexModel([("child_id", ASCENDING), ("earned_at", DESCENDING), ("id", DESCENDING)], name="child_id_earned_at_id"),
+        IndexModel([("child_id", ASCENDING), ("name", ASCENDING)], name="child_id_name"),
+    ],
+}
+
+# Representative queries issued by ChildService, explained by the index advisor
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "get_child", "command": {"find": "children", "filter": {"id": "<child_id>"}}},
+    {"name": "get_children", "command": {"find": "children", "sort": {"created_at": 1, "id": 1}, "limit": 101}},
+    {"name": "get_child_stickers", "command": {
+        "find": "stickers", "filter": {"child_id": "<child_id>"}, "sort": {"earned_at": -1, "id": -1}, "limit": 101,
+    }},
+    {"name": "collected_sticker_names", "command": {
+        "find": "stickers", "filter": {"child_id": "<child_id>"}, "projection": {"name": 1},
+    }},
+    {"name": "child_sessions", "command": {
+        "find": "game_sessions", "filter": {"child_id": "<child_id>"}, "sort": {"timestamp": 1},
+    }},
+    {"name": "child_stats", "command": {
+        "aggregate": "session_rollups",
+        "pipeline": [{"$match": {"child_id": "<child_id>", "day": {"$gte": datetime(2024, 1, 1)}}}],
+        "cursor": {},
+    }},
+    {"name": "rollup_backfill", "command": {
+        "aggregate": "game_sessions",
+        "pipeline": [{"$match": {"child_id": "<child_id>", "timestamp": {"$lt": datetime(2024, 1, 1)}}}],
+        "cursor": {},
+    }},
+    {"name": "session_history", "command": {
+        "find": "session_archive", "filter": {"child_id": "<child_id>"}, "sort": {"month": 1},
+    }},
+    {"name": "delete_child_sessions", "command": {
+        "delete": "game_sessions", "deletes": [{"q": {"child_id": "<child_id>"}, "limit": 0}],
+    }},
+    {"name": "delete_child_stickers", "command": {
+        "delete": "stickers", "deletes": [{"q": {"child_id": "<child_id>"}, "limit": 0}],
+    }},
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    names = list(INDEX_REGISTRY)
+    results = await asyncio.gather(
+        *(db[name].create_indexes(INDEX_REGISTRY[name]) for name in names),
+        return_exceptions=True,
+    )
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            # e.g. duplicate ids blocking a unique index; keep serving and report it
+            logger.error(f"Index creation failed for {name}: {result}")
+        else:
+            logger.info(f"Indexes ready for {name}: {', '.join(result)}")
+
+
+async def index_usage(db: AsyncIOMotorDatabase) -> Dict[str, List[Dict[str, Any]]]:
+    usage: Dict[str, List[Dict[str, Any]]] = {}
+    for name in INDEX_REGISTRY:
+        stats = await db[name].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        usage[name] = [
+            {
+                "name": s["name"],
+                "key": s.get("key", {}),
+                "ops": s.get("accesses", {}).get("ops", 0),
+                "since": s.get("accesses", {}).get("since"),
+            }
+            for s in stats
+        ]
+    return usage
+
+
+def _plan_stages(plan: Any) -> Iterator[str]:
+    # Works for both classic and SBE explain output by walking every nested stage
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def explain_query_shapes(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    reports = []
+    for shape in QUERY_SHAPES:
+        explain = await db.command("explain", shape["command"], verbosity="queryPlanner")
+        stages = sorted(set(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))))
+        reports.append({
+            "name": shape["name"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return reports
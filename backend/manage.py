@@ -0,0 +1,120 @@
+"""Maintenance commands, run from the backend directory: python manage.py --help"""
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import logging
+import typer
+
+from audio import default_audio_dir
+from audio_sprite import build_sprite
+from database import MongoConnection
+from services.archive import compact_sessions
+from services.snapshot import SnapshotRestoreError, restore_snapshot_file, write_snapshot_file
+import migrations
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+cli = typer.Typer(help="Betűkereső maintenance commands")
+
+
+def run_with_db(job, **kwargs):
+    async def main():
+        mongo = MongoConnection.from_env()
+        try:
+            return await job(mongo.db, **kwargs)
+        finally:
+            mongo.close()
+    return asyncio.run(main())
+
+
+@cli.command("backfill-sticker-masks")
+def backfill_sticker_masks(batch_size: int = typer.Option(500, help="Children per aggregation/bulk write")):
+    """Seed the collected-sticker bitset on children created before it existed."""
+    updated = run_with_db(migrations.backfill_sticker_masks, batch_size=batch_size)
+    typer.echo(f"Updated {updated} children")
+
+
+@cli.command("backfill-session-rollups")
+def backfill_session_rollups(
+    batch_size: int = typer.Option(100, help="Children per checkpointed batch"),
+    concurrency: int = typer.Option(4, help="Children aggregated in parallel"),
+    restart: bool = typer.Option(False, help="Ignore the checkpoint and start from the first child"),
+):
+    """Build daily session rollups from game_sessions logged before live rollups started (resumable)."""
+    written = run_with_db(migrations.backfill_session_rollups, batch_size=batch_size, concurrency=concurrency, restart=restart)
+    typer.echo(f"Wrote {written} rollups")
+
+
+@cli.command("backfill-recent-progress")
+def backfill_recent_progress(concurrency: int = typer.Option(4, help="Children processed in parallel")):
+    """Seed the last-answers bitfield behind star scoring from each child's session history."""
+    updated = run_with_db(migrations.backfill_recent_progress, concurrency=concurrency)
+    typer.echo(f"Seeded {updated} grapheme progress entries")
+
+
+@cli.command("compact-sessions")
+def compact_old_sessions(
+    older_than_days: int = typer.Option(180, help="Archive whole months older than this many days"),
+):
+    """Move old game_sessions into compressed per-child monthly archive blocks (re-runnable)."""
+    try:
+        archived = run_with_db(compact_sessions, older_than_days=older_than_days)
+    except RuntimeError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
+    typer.echo(f"Archived {archived} sessions")
+
+
+@cli.command("snapshot")
+def snapshot(
+    out: Path = typer.Argument(..., help="Snapshot file to write (gzipped NDJSON)"),
+    child_id: Optional[List[str]] = typer.Option(None, help="Child to include (repeatable); all children when omitted"),
+):
+    """Write children with their sessions, stickers and archive blocks to one compressed file."""
+    documents = run_with_db(write_snapshot_file, path=str(out), child_ids=child_id or None)
+    typer.echo(f"Wrote {documents} documents to {out}")
+
+
+@cli.command("restore")
+def restore(
+    snapshot_file: Path = typer.Argument(..., exists=True, dir_okay=False, help="File written by the snapshot command"),
+    replace: bool = typer.Option(False, help="Replace children that already exist instead of refusing"),
+    batch_size: int = typer.Option(1000, help="Documents per insert_many"),
+    concurrency: int = typer.Option(8, help="insert_many batches in flight"),
+):
+    """Load a snapshot with concurrent unordered bulk inserts."""
+    try:
+        report = run_with_db(
+            restore_snapshot_file, path=str(snapshot_file), replace=replace, batch_size=batch_size, concurrency=concurrency
+        )
+    except (ValueError, SnapshotRestoreError) as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
+    typer.echo(
+        f"Restored {report['rows']} documents for {len(report['child_ids'])} children in {report['seconds']}s "
+        f"({report['rows_per_second']} rows/s): {report['written']}"
+    )
+    if report["failed_batches"]:
+        typer.echo(f"{report['failed_batches']} batches failed, first: {report['error']}", err=True)
+        raise typer.Exit(1)
+
+
+@cli.command("build-audio-sprite")
+def build_audio_sprite(audio_dir: str = typer.Option(None, help="Clip directory (default: AUDIO_DIR)")):
+    """Pack every grapheme and phonetic-word clip into one MP3 sprite plus manifest."""
+    manifest = build_sprite(audio_dir or default_audio_dir())
+    clips = len(manifest["graphemes"]) + len(manifest["words"])
+    typer.echo(f"Sprite {manifest['version']}: {clips} clips, {manifest['size']} bytes, {manifest['duration']:.1f}s")
+    if manifest["missing"]:
+        typer.echo(f"Missing {len(manifest['missing'])} clips: {', '.join(manifest['missing'])}")
+
+
+if __name__ == "__main__":
+    cli()
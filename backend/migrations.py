@@ -0,0 +1,184 @@
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from services.archive import session_history
+from services.child_service import push_recent, stars_for
+from services.rollups import ROLLUP_BACKFILL_STATE_ID, SOURCE_BACKFILL, SOURCE_RESTORE, ensure_live_cutoff
+from sticker_catalog import popcount, sticker_mask_from_names, sticker_mask_words
+from typing import Dict, List, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_sticker_masks(db: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """Seed sticker_mask/unique_stickers on children created before the bitset existed."""
+    updated = 0
+    cursor = db.children.find({"sticker_mask": {"$exists": False}}, {"_id": 0, "id": 1}).batch_size(batch_size)
+    batch = []
+    async for child in cursor:
+        batch.append(child["id"])
+        if len(batch) >= batch_size:
+            updated += await _backfill_sticker_mask_batch(db, batch)
+            batch = []
+    if batch:
+        updated += await _backfill_sticker_mask_batch(db, batch)
+    return updated
+
+
+async def _backfill_sticker_mask_batch(db: AsyncIOMotorDatabase, child_ids) -> int:
+    names = {child_id: set() for child_id in child_ids}
+    pipeline = [
+        {"$match": {"child_id": {"$in": child_ids}}},
+        {"$group": {"_id": "$child_id", "names": {"$addToSet": "$name"}}},
+    ]
+    async for group in db.stickers.aggregate(pipeline):
+        names[group["_id"]].update(n for n in group["names"] if n)
+
+    requests = []
+    for child_id, child_names in names.items():
+        mask = sticker_mask_from_names(child_names)
+        requests.append(UpdateOne(
+            # Guarded so a mask maintained by the live award path is never overwritten
+            {"id": child_id, "sticker_mask": {"$exists": False}},
+            {"$set": {"sticker_mask": sticker_mask_words(mask), "unique_stickers": popcount(mask)}},
+        ))
+    result = await db.children.bulk_write(requests, ordered=False)
+    logger.info(f"Backfilled sticker masks for {result.modified_count} children")
+    return result.modified_count
+
+
+async def backfill_session_rollups(db: AsyncIOMotorDatabase, batch_size: int = 100, concurrency: int = 4,
+                                   restart: bool = False) -> int:
+    """Build session_rollups from sessions logged before live rollups started.
+
+    Each child's backfill rollups are recomputed and written with $set, so
+    processing a child again is harmless; children are taken in id order and
+    the last finished batch is checkpointed, so an interrupted run resumes
+    where it stopped. Up to concurrency children are aggregated at once.
+    The checkpoint is marked complete at the end; compaction waits for that,
+    as it moves sessions out of game_sessions, where the backfill reads them.
+    """
+    cutoff = await ensure_live_cutoff(db)
+    if restart:
+        await db.rollup_state.delete_one({"_id": ROLLUP_BACKFILL_STATE_ID})
+    state = await db.rollup_state.find_one({"_id": ROLLUP_BACKFILL_STATE_ID}) or {}
+    query = {"id": {"$gt": state["last_child_id"]}} if state.get("last_child_id") else {}
+    if query:
+        logger.info(f"Resuming rollup backfill after child {state['last_child_id']}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    written = 0
+    batch: List[str] = []
+    cursor = db.children.find(query, {"_id": 0, "id": 1}).sort("id", 1).batch_size(batch_size)
+    async for child in cursor:
+        batch.append(child["id"])
+        if len(batch) >= batch_size:
+            written += await _backfill_rollup_batch(db, batch, cutoff, semaphore)
+            batch = []
+    if batch:
+        written += await _backfill_rollup_batch(db, batch, cutoff, semaphore)
+    await db.rollup_state.update_one(
+        {"_id": ROLLUP_BACKFILL_STATE_ID},
+        {"$set": {"completed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    return written
+
+
+async def _backfill_rollup_batch(db: AsyncIOMotorDatabase, child_ids: List[str], cutoff: datetime,
+                                 semaphore: asyncio.Semaphore) -> int:
+    async def one(child_id: str) -> int:
+        async with semaphore:
+            return await _backfill_child_rollups(db, child_id, cutoff)
+
+    written = sum(await asyncio.gather(*(one(child_id) for child_id in child_ids)))
+    await db.rollup_state.update_one(
+        {"_id": ROLLUP_BACKFILL_STATE_ID},
+        {"$set": {"last_child_id": child_ids[-1], "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    logger.info(f"Backfilled {written} rollups for {len(child_ids)} children (through {child_ids[-1]})")
+    return written
+
+
+async def _backfill_child_rollups(db: AsyncIOMotorDatabase, child_id: str, cutoff: datetime) -> int:
+    if await db.session_rollups.find_one({"child_id": child_id, "source": SOURCE_RESTORE}, {"_id": 1}):
+        # Restored from a snapshot: its rollups were rebuilt from its whole history then
+        return 0
+    # child_id + timestamp range: served by the child_id_timestamp index
+    pipeline = [
+        {"$match": {"child_id": child_id, "timestamp": {"$lt": cutoff}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateFromParts": {
+                    "year": {"$year": "$timestamp"}, "month": {"$month": "$timestamp"}, "day": {"$dayOfMonth": "$timestamp"},
+                }},
+                "grapheme": "$grapheme",
+                "game_mode": "$game_mode",
+            },
+            "attempts": {"$sum": 1},
+            "correct": {"$sum": {"$cond": ["$is_correct", 1, 0]}},
+            "timed_attempts": {"$sum": {"$cond": [{"$gt": ["$response_time", None]}, 1, 0]}},
+            "response_time_sum": {"$sum": "$response_time"},
+            "response_time_sq_sum": {"$sum": {"$multiply": ["$response_time", "$response_time"]}},
+            "response_time_min": {"$min": "$response_time"},
+            "response_time_max": {"$max": "$response_time"},
+        }},
+    ]
+    now = datetime.utcnow()
+    requests = []
+    async for group in db.game_sessions.aggregate(pipeline):
+        key = {**group.pop("_id"), "child_id": child_id, "source": SOURCE_BACKFILL}
+        requests.append(UpdateOne(key, {"$set": {**group, "updated_at": now}}, upsert=True))
+    if requests:
+        await db.session_rollups.bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+async def backfill_recent_progress(db: AsyncIOMotorDatabase, concurrency: int = 4, max_retries: int = 3) -> int:
+    """Seed progress.<grapheme>.recent/recent_count (and stars) from each child's session history.
+
+    Recomputed from scratch, so it can be run again at any time. A child that
+    answered while its history was being read is read again (up to max_retries).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(child_id: str) -> int:
+        async with semaphore:
+            for _ in range(max_retries):
+                updated = await _backfill_child_recent(db, child_id)
+                if updated is not None:
+                    return updated
+            logger.warning(f"Child {child_id} kept changing, recent answers not seeded")
+            return 0
+
+    child_ids = [child["id"] async for child in db.children.find({}, {"_id": 0, "id": 1})]
+    updated = sum(await asyncio.gather(*(one(child_id) for child_id in child_ids)))
+    logger.info(f"Seeded recent answers for {updated} graphemes of {len(child_ids)} children")
+    return updated
+
+
+async def _backfill_child_recent(db: AsyncIOMotorDatabase, child_id: str):
+    child = await db.children.find_one({"id": child_id}, {"_id": 0, "progress": 1, "updated_at": 1})
+    if not child or not child.get("progress"):
+        return 0
+    recent: Dict[str, Tuple[int, int]] = {grapheme: (0, 0) for grapheme in child["progress"]}
+    # Archived and live sessions, oldest first: the bitfield ends up holding the latest answers
+    async for session in session_history(db, child_id):
+        if session["grapheme"] in recent:
+            recent[session["grapheme"]] = push_recent(*recent[session["grapheme"]], session["is_correct"])
+    update = {}
+    for grapheme, (bits, count) in recent.items():
+        if not count:
+            # No logged answers to go by: left to fill up with the next answers
+            continue
+        update[f"progress.{grapheme}.recent"] = bits
+        update[f"progress.{grapheme}.recent_count"] = count
+        update[f"progress.{grapheme}.stars"] = stars_for(bits, count)
+    if not update:
+        return 0
+    # Only if no answer was recorded meanwhile (every progress write sets updated_at)
+    result = await db.children.update_one({"id": child_id, "updated_at": child.get("updated_at")}, {"$set": update})
+    return len(update) // 3 if result.matched_count else None
@@ -33,11 +33,20 @@ class ChildSettings(BaseModel):
     stickers_enabled: bool = Field(default=True)
     additional_sticker_interval: int = Field(default=5, ge=0, le=50)
 
+# Stars are based on accuracy over this many latest answers per grapheme
+RECENT_WINDOW = 10
+
 # Progress for individual graphemes
 class GraphemeProgress(BaseModel):
     stars: int = Field(default=0, ge=0, le=3)
     attempts: int = Field(default=0)
     correct: int = Field(default=0)
+    # Answers that reported a response_time, and their sum in milliseconds
+    timed_attempts: int = Field(default=0)
+    response_time_sum: int = Field(default=0)
+    # The last RECENT_WINDOW answers as bits (bit 0 = latest, 1 = correct) and how many of them there are
+    recent: int = Field(default=0, ge=0)
+    recent_count: int = Field(default=0, ge=0)
 
 # Child Model
 class Child(BaseModel):
@@ -45,11 +54,21 @@ class Child(BaseModel):
     name: str = Field(min_length=1, max_length=50)
     streak: int = Field(default=0, ge=0)
     total_stickers: int = Field(default=0, ge=0)
+    # Bitset of collected sticker catalog ids in 32-bit words keyed by word index, and its popcount
+    sticker_mask: Dict[str, int] = Field(default_factory=dict)
+    unique_stickers: int = Field(default=0, ge=0)
     progress: Dict[str, GraphemeProgress] = Field(default_factory=dict)
     settings: ChildSettings = Field(default_factory=ChildSettings)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Lightweight view for list screens (GET /api/children?fields=summary)
+class ChildSummary(BaseModel):
+    id: str
+    name: str
+    streak: int = 0
+    total_stickers: int = 0
+
 class ChildCreate(BaseModel):
     name: str = Field(min_length=1, max_length=50)
 
@@ -68,7 +87,8 @@ class GameSession(BaseModel):
 
 class GameSessionCreate(BaseModel):
     game_mode: GameMode
-    grapheme: str
+    # Used as a key of Child.progress, so no field path separators
+    grapheme: str = Field(min_length=1, max_length=10, pattern=r"^[^.$]+$")
     is_correct: bool
     response_time: Optional[int] = None
 
@@ -76,6 +96,7 @@ class GameSessionCreate(BaseModel):
 class Sticker(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     child_id: str
+    catalog_id: Optional[int] = None  # id in GET /api/stickers/catalog
     name: str
     emoji: str
     streak_level: int
@@ -89,12 +110,75 @@ class ProgressUpdateResponse(BaseModel):
     sticker_earned: Optional[Sticker] = None
     total_stickers: int
 
+# Per-child statistics over game_sessions (GET /api/children/{id}/stats)
+class GraphemeStats(BaseModel):
+    grapheme: str
+    attempts: int
+    correct: int
+    accuracy: float
+    mean_response_time: Optional[float] = None  # milliseconds
+
+class GameModeStats(BaseModel):
+    game_mode: GameMode
+    attempts: int
+    correct: int
+    accuracy: float
+
+class ResponseTimeStats(BaseModel):
+    count: int = 0
+    mean: Optional[float] = None  # milliseconds
+    stddev: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+class DailyStats(BaseModel):
+    date: str  # YYYY-MM-DD (UTC)
+    attempts: int
+    correct: int
+    accuracy: float
+
+class ChildStats(BaseModel):
+    child_id: str
+    days: int
+    since: datetime
+    attempts: int = 0
+    correct: int = 0
+    accuracy: float = 0.0
+    by_grapheme: List[GraphemeStats] = Field(default_factory=list)
+    by_mode: List[GameModeStats] = Field(default_factory=list)
+    response_time: ResponseTimeStats = Field(default_factory=ResponseTimeStats)
+    daily: List[DailyStats] = Field(default_factory=list)
+    # Accuracy of the last 7 days minus the 7 days before (None without answers in both)
+    trend: Optional[float] = None
+
 # Grapheme with Phonetic Info
 class GraphemeInfo(BaseModel):
     grapheme: str
     phonetic_word: str
     audio_url: Optional[str] = None
 
+# Whole-session deck (POST /api/children/{id}/deck)
+class DeckRequest(BaseModel):
+    game_mode: GameMode = GameMode.FIND_LETTER
+
+class DeckCard(BaseModel):
+    grapheme: str
+    display: str
+
+class DeckRound(BaseModel):
+    target: str
+    display: str
+    case: LetterCase
+    phonetic_word: str
+    variants: Dict[str, str]  # lowercase / uppercase / titlecase forms
+    choices: List[DeckCard] = Field(default_factory=list)  # find-letter grid, target included
+
+class Deck(BaseModel):
+    child_id: str
+    game_mode: GameMode
+    letter_case: LetterCase
+    rounds: List[DeckRound]
+
 # Hungarian Graphemes Data
 HUNGARIAN_GRAPHEMES = [
     "a", "á", "b", "c", "cs", "d", "dz", "dzs", "e", "é", "f", "g", "gy", "h", "i", "í", 
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    """Opaque keyset cursor for the last item of a page: (sort field value, id)."""
+    raw = json.dumps([sort_value.isoformat(), doc_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, doc_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), str(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(field: str, after: Optional[str], descending: bool = False) -> Dict[str, Any]:
+    # Rows strictly after the cursor in (field, id) order; id breaks ties on equal timestamps
+    if not after:
+        return {}
+    sort_value, doc_id = decode_cursor(after)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [{field: {op: sort_value}}, {field: sort_value, "id": {op: doc_id}}]}
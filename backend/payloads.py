@@ -0,0 +1,43 @@
+from fastapi import Request, Response
+from typing import Any, Dict, Optional
+import gzip
+import hashlib
+import json
+
+
+class StaticPayload:
+    """A JSON document that only changes with a deploy, serialized and gzipped once.
+
+    The ETag is a content hash (or the payload's own version), so it is strong
+    and identical on every worker.
+    """
+
+    def __init__(self, payload: Any, max_age: int = 86400, version: Optional[str] = None):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = f'"{version or hashlib.sha256(self.body).hexdigest()[:16]}"'
+        # The gzip representation has different bytes, so it gets its own strong tag
+        self.gzip_etag = f'{self.etag[:-1]}-gzip"'
+        self.headers: Dict[str, str] = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+            "Vary": "Accept-Encoding",
+        }
+        self.gzip_headers: Dict[str, str] = {**self.headers, "ETag": self.gzip_etag, "Content-Encoding": "gzip"}
+
+    def not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return self.etag in tags or self.gzip_etag in tags
+
+    def response(self, request: Request) -> Response:
+        use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+        headers = self.gzip_headers if use_gzip else self.headers
+        if self.not_modified(request):
+            return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Encoding"})
+        return Response(content=self.gzip_body if use_gzip else self.body, media_type="application/json", headers=headers)
@@ -0,0 +1,34 @@
+"""JSON responses without FastAPI's response_model round trip.
+
+With a response_model, FastAPI dumps the returned models to dicts, validates
+those dicts against the model again and runs jsonable_encoder before the JSON
+encoder sees them. Routes whose data the services just built from validated
+models return ModelResponse instead: one serialization by pydantic-core, no
+validation. Such routes declare response_model=None and document their schema
+with responses={200: {"model": ...}}.
+"""
+from functools import lru_cache
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from starlette.background import BackgroundTask
+from typing import Any, Mapping, Optional
+
+# App-wide default response class (server.py): orjson instead of json.dumps for everything else
+FastJSONResponse = ORJSONResponse
+
+
+@lru_cache(maxsize=None)
+def type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+class ModelResponse(FastJSONResponse):
+    """Validated models (or containers of them) serialized straight to JSON as response_type."""
+
+    def __init__(self, content: Any, response_type: Any, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, background: Optional[BackgroundTask] = None):
+        self.response_type = response_type
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        return type_adapter(self.response_type).dump_json(content)
@@ -0,0 +1,90 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Any, Dict, List, Optional
+from dependencies import get_child_service, get_db, require_admin_token
+from indexes import explain_query_shapes, index_usage
+from services.child_service import ChildService
+from services.export import gzip_chunks
+from services.snapshot import SnapshotRestoreError, ndjson_records, restore_snapshot, snapshot_lines
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+@router.get("/pool", response_model=Dict[str, Any])
+async def get_pool_stats(request: Request):
+    """Mongo connection pool telemetry (checked-out/available connections, wait time)"""
+    return request.app.state.mongo.pool_stats()
+
+@router.get("/session-buffer", response_model=Dict[str, Any])
+async def get_session_buffer_stats(request: Request):
+    """Write-behind game_sessions buffer metrics (queue depth, flush latency)"""
+    writer = request.app.state.session_writer
+    return writer.stats() if writer is not None else {"enabled": False}
+
+@router.get("/child-cache", response_model=Dict[str, Any])
+async def get_child_cache_stats(request: Request):
+    """In-process Child document cache counters (hits, misses, evictions)"""
+    cache = request.app.state.child_service.child_cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+@router.get("/audio-cache", response_model=Dict[str, Any])
+async def get_audio_cache_stats(request: Request):
+    """In-memory audio clip cache counters"""
+    return request.app.state.audio.stats()
+
+@router.get("/indexes", response_model=Dict[str, Any])
+async def get_index_report(db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Index usage ($indexStats) and service queries whose winning plan is a COLLSCAN"""
+    queries = await explain_query_shapes(db)
+    return {
+        "usage": await index_usage(db),
+        "queries": queries,
+        "collscan": [q["name"] for q in queries if q["collscan"]],
+    }
+
+@router.get("/snapshot", response_class=StreamingResponse)
+async def download_snapshot(
+    child_id: Optional[List[str]] = Query(None, description="Children to include (repeat the parameter); all when omitted"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    service: ChildService = Depends(get_child_service)
+):
+    """Gzipped NDJSON snapshot of children with their sessions, stickers and archive blocks"""
+    if service.session_writer is not None:
+        await service.session_writer.flush()
+    filename = f"snapshot-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson.gz"
+    return StreamingResponse(
+        gzip_chunks(snapshot_lines(db, child_id)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/restore", response_model=Dict[str, Any])
+async def upload_snapshot(
+    request: Request,
+    replace: bool = Query(False, description="Replace children that already exist instead of refusing"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    concurrency: int = Query(8, ge=1, le=64),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    service: ChildService = Depends(get_child_service)
+):
+    """Restore a snapshot sent as the request body (gzipped NDJSON), streamed into concurrent bulk inserts"""
+    if service.session_writer is not None:
+        # Buffered answers of children about to be replaced must not land after their delete
+        await service.session_writer.flush()
+    changed: List[str] = []
+    try:
+        report = await restore_snapshot(db, ndjson_records(request.stream()), replace, batch_size, concurrency)
+        changed = report.pop("child_ids")
+    except SnapshotRestoreError as e:
+        changed = e.child_ids
+        raise HTTPException(status_code=400 if isinstance(e.__cause__, ValueError) else 500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Also when it stopped half way: cached copies of these children are stale either way
+        service.forget_children(changed)
+    if report["failed_batches"]:
+        # Partly restored: the report says how far it got, restore again with replace
+        raise HTTPException(status_code=500, detail=report)
+    return report
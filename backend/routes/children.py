@@ -1,42 +1,136 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models import Child, ChildCreate, ChildUpdate, GameSessionCreate, ProgressUpdateResponse, Sticker, SettingsUpdate
-from services.child_service import ChildService
-from motor.motor_asyncio import AsyncIOMotorDatabase
-import os
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from models import (
+    Child, ChildCreate, ChildStats, ChildUpdate, Deck, DeckRequest, GameSessionCreate, GraphemeProgress,
+    ProgressUpdateResponse, Sticker, SettingsUpdate
+)
+from services.child_service import ChildService, child_projection
+from dependencies import get_child_service
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from responses import FastJSONResponse, ModelResponse
+from services.export import EXPORT_MEDIA_TYPES, ExportFormat, encode_rows, export_filename, gzip_chunks
+from services.stats import DEFAULT_STATS_DAYS, MAX_STATS_DAYS
 
 router = APIRouter(prefix="/children", tags=["children"])
 
-# Dependency to get database
-async def get_db():
-    from motor.motor_asyncio import AsyncIOMotorClient
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'betukkereso')]
-    return db
+MAX_PROGRESS_BATCH = 100
 
-# Dependency to get child service
-async def get_child_service(db: AsyncIOMotorDatabase = Depends(get_db)) -> ChildService:
-    return ChildService(db)
+FIELDS_DESCRIPTION = "Comma-separated Child fields (dotted paths allowed) or 'summary'; omitted fields are not returned"
 
-@router.get("/", response_model=List[Child])
-async def get_children(service: ChildService = Depends(get_child_service)):
-    """Get all children"""
-    return await service.get_children()
+# With fields= the response is a partial Child, so it cannot be validated against the full model;
+# the documented schema stays the full Child
+@router.get("/", response_model=None, responses={200: {"model": List[Child]}})
+async def get_children(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: ChildService = Depends(get_child_service)
+):
+    """Get children, one page at a time (next page cursor in X-Next-Cursor)"""
+    try:
+        if fields:
+            children, next_cursor = await service.get_children_fields(child_projection(fields), limit, after)
+        else:
+            children, next_cursor = await service.get_children(limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if after is None:
+        headers["X-Total-Count"] = str(await service.count_children())
+    # Child-shaped documents either way (documents.py), serialized as they are
+    return FastJSONResponse(children, headers=headers)
 
 @router.post("/", response_model=Child)
 async def create_child(child_data: ChildCreate, service: ChildService = Depends(get_child_service)):
     """Create a new child profile"""
     return await service.create_child(child_data)
 
-@router.get("/{child_id}", response_model=Child)
-async def get_child(child_id: str, service: ChildService = Depends(get_child_service)):
+@router.get("/{child_id}", response_model=None, responses={200: {"model": Child}})
+async def get_child(
+    child_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: ChildService = Depends(get_child_service)
+):
     """Get a specific child by ID"""
-    child = await service.get_child(child_id)
+    if fields:
+        try:
+            child = await service.get_child_fields(child_id, child_projection(fields))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        child = await service.get_child(child_id)
     if not child:
         raise HTTPException(status_code=404, detail="Child not found")
     return child
 
+@router.get("/{child_id}/progress", response_model=Dict[str, GraphemeProgress])
+async def get_child_progress(child_id: str, service: ChildService = Depends(get_child_service)):
+    """Get a child's per-grapheme progress only"""
+    progress = await service.get_child_progress(child_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+    return progress
+
+@router.get("/{child_id}/graphemes/adaptive")
+async def get_adaptive_graphemes(
+    child_id: str,
+    count: int = 9,
+    include_foreign: bool = False,
+    service: ChildService = Depends(get_child_service)
+):
+    """Random graphemes for a round, weighted towards the child's weak, new and slow ones"""
+    if count < 1 or count > 20:
+        raise HTTPException(status_code=400, detail="Count must be between 1 and 20")
+    graphemes = await service.get_adaptive_graphemes(child_id, count, include_foreign)
+    if graphemes is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+    return {"graphemes": graphemes}
+
+@router.post("/{child_id}/deck", response_model=Deck)
+async def get_deck(child_id: str, deck_request: Optional[DeckRequest] = None, service: ChildService = Depends(get_child_service)):
+    """Every round of a game session (targets, distractors, case variants, phonetic words) in one response"""
+    deck = await service.get_deck(child_id, (deck_request or DeckRequest()).game_mode)
+    if deck is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+    return deck
+
+@router.get("/{child_id}/stats", response_model=ChildStats)
+async def get_child_stats(
+    child_id: str,
+    days: int = Query(DEFAULT_STATS_DAYS, ge=1, le=MAX_STATS_DAYS, description="Window in days, ending now"),
+    service: ChildService = Depends(get_child_service)
+):
+    """Accuracy per grapheme and game mode, response times and recent trend from the game session log"""
+    stats = await service.get_child_stats(child_id, days)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+    return stats
+
+@router.get("/{child_id}/sessions/export", response_class=StreamingResponse)
+async def export_sessions(
+    child_id: str,
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = Query(False, description="Send a .gz file, compressed while streaming"),
+    start: Optional[datetime] = Query(None, description="First timestamp included"),
+    end: Optional[datetime] = Query(None, description="Timestamps before this one are included"),
+    service: ChildService = Depends(get_child_service)
+):
+    """Download the child's whole answer log (archived and live sessions), streamed in timestamp order"""
+    rows = await service.get_session_history(child_id, start, end)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+    chunks = encode_rows(rows, format)
+    filename = export_filename(child_id, format, gzip)
+    return StreamingResponse(
+        gzip_chunks(chunks) if gzip else chunks,
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @router.delete("/{child_id}")
 async def delete_child(child_id: str, service: ChildService = Depends(get_child_service)):
     """Delete a child and all associated data"""
@@ -53,18 +147,45 @@ async def update_child(child_id: str, update_data: ChildUpdate, service: ChildSe
         raise HTTPException(status_code=404, detail="Child not found")
     return child
 
-@router.post("/{child_id}/progress", response_model=ProgressUpdateResponse)
+@router.post("/{child_id}/progress", response_model=None, responses={200: {"model": ProgressUpdateResponse}})
 async def record_progress(child_id: str, session_data: GameSessionCreate, service: ChildService = Depends(get_child_service)):
     """Record game session and update child progress"""
     try:
-        return await service.record_game_session(child_id, session_data)
+        update = await service.record_game_session(child_id, session_data)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    return ModelResponse(update, ProgressUpdateResponse)
 
-@router.get("/{child_id}/stickers", response_model=List[Sticker])
-async def get_child_stickers(child_id: str, service: ChildService = Depends(get_child_service)):
-    """Get all stickers earned by a child"""
-    return await service.get_child_stickers(child_id)
+@router.post("/{child_id}/progress/batch", response_model=List[ProgressUpdateResponse])
+async def record_progress_batch(child_id: str, sessions_data: List[GameSessionCreate], service: ChildService = Depends(get_child_service)):
+    """Record an ordered list of game sessions; returns one progress update per session"""
+    if len(sessions_data) < 1 or len(sessions_data) > MAX_PROGRESS_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch must contain between 1 and {MAX_PROGRESS_BATCH} sessions")
+    try:
+        return await service.record_game_sessions(child_id, sessions_data)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{child_id}/stickers", response_model=None, responses={200: {"model": List[Sticker]}})
+async def get_child_stickers(
+    child_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: ChildService = Depends(get_child_service)
+):
+    """Get stickers earned by a child, newest first, one page at a time (next page cursor in X-Next-Cursor)"""
+    try:
+        stickers, next_cursor = await service.get_child_stickers(child_id, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if after is None:
+        total = await service.count_child_stickers(child_id)
+        if total is not None:
+            headers["X-Total-Count"] = str(total)
+    return FastJSONResponse(stickers, headers=headers)
 
 @router.put("/{child_id}/settings")
 async def update_settings(child_id: str, update: SettingsUpdate, service: ChildService = Depends(get_child_service)):
@@ -1,51 +1,82 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict
-from services.child_service import ChildService
-from models import GraphemeInfo
-from motor.motor_asyncio import AsyncIOMotorDatabase
-import os
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import List, Optional
+from audio import AUDIO_MEDIA_TYPE, AudioClip, AudioLibrary, audio_response
+from dependencies import get_audio_library
+from models import GraphemeInfo, PHONEME_MAP_HU
+from graphemes import GRAPHEME_INFO, GRAPHEME_VARIANTS, get_random_grapheme_sets, get_random_graphemes as sample_graphemes
+from payloads import StaticPayload
+import unicodedata
 
 router = APIRouter(prefix="/game", tags=["game"])
 
-# Dependency to get database
-async def get_db():
-    from motor.motor_asyncio import AsyncIOMotorClient
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'betukkereso')]
-    return db
+# Upper bound for one bulk request (a whole school's worth of rounds)
+MAX_GRAPHEME_SETS = 10000
 
-# Dependency to get child service
-async def get_child_service(db: AsyncIOMotorDatabase = Depends(get_db)) -> ChildService:
-    return ChildService(db)
+# Fetched on every app launch; serialized and compressed once per process
+GRAPHEMES = StaticPayload(GRAPHEME_INFO)
 
-@router.get("/graphemes", response_model=List[Dict[str, str]])
-async def get_graphemes(service: ChildService = Depends(get_child_service)):
+@router.get("/graphemes", response_model=None, responses={200: {"model": List[GraphemeInfo]}})
+async def get_graphemes(request: Request):
     """Get all Hungarian graphemes with phonetic information"""
-    return service.get_grapheme_info()
+    return GRAPHEMES.response(request)
 
 @router.get("/graphemes/random")
 async def get_random_graphemes(
     count: int = 9, 
     include_foreign: bool = False, 
     trouble_bias: bool = True,
-    service: ChildService = Depends(get_child_service)
+    sets: Optional[int] = None
 ):
-    """Get random graphemes for game sessions"""
+    """Get random graphemes for game sessions (or, with sets=N, N independent rounds)"""
     if count < 1 or count > 20:
         raise HTTPException(status_code=400, detail="Count must be between 1 and 20")
+    if sets is not None:
+        if sets < 1 or sets > MAX_GRAPHEME_SETS:
+            raise HTTPException(status_code=400, detail=f"Sets must be between 1 and {MAX_GRAPHEME_SETS}")
+        return {"sets": get_random_grapheme_sets(sets, count, include_foreign, trouble_bias)}
     
     return {
-        "graphemes": service.get_random_graphemes(count, include_foreign, trouble_bias)
+        "graphemes": sample_graphemes(count, include_foreign, trouble_bias)
     }
 
-@router.get("/audio/{grapheme}")
-async def get_grapheme_audio(grapheme: str):
-    """Get audio file for a specific grapheme (placeholder)"""
-    # TODO: Implement actual audio generation/serving
-    # For now, return a placeholder response
-    return {
-        "grapheme": grapheme,
-        "audio_url": f"/static/audio/{grapheme}.mp3",
-        "status": "placeholder"
-    }
\ No newline at end of file
+def _known_grapheme(grapheme: str) -> str:
+    grapheme = unicodedata.normalize("NFC", grapheme)
+    if grapheme not in GRAPHEME_VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown grapheme")
+    return grapheme
+
+def _clip_response(request: Request, clip: Optional[AudioClip]) -> Response:
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return audio_response(
+        clip,
+        if_none_match=request.headers.get("if-none-match"),
+        range_header=request.headers.get("range"),
+        if_range=request.headers.get("if-range"),
+    )
+
+@router.get("/audio-sprite/manifest")
+async def get_audio_sprite_manifest(request: Request, audio: AudioLibrary = Depends(get_audio_library)):
+    """Byte/time offsets of every grapheme and phonetic-word clip in the current audio sprite"""
+    manifest = await audio.sprite_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Audio sprite not built")
+    return manifest.response(request)
+
+@router.get("/audio-sprite/{version}.mp3", response_class=Response, responses={200: {"content": {AUDIO_MEDIA_TYPE: {}}}})
+async def get_audio_sprite(version: str, request: Request, audio: AudioLibrary = Depends(get_audio_library)):
+    """All clips in one MP3; versioned by content hash, so cached forever"""
+    return _clip_response(request, await audio.get_sprite(version))
+
+@router.get("/audio/{grapheme}", response_class=Response, responses={200: {"content": {AUDIO_MEDIA_TYPE: {}}}})
+async def get_grapheme_audio(grapheme: str, request: Request, audio: AudioLibrary = Depends(get_audio_library)):
+    """MP3 pronunciation of a grapheme (supports Range, ETag/If-None-Match)"""
+    return _clip_response(request, await audio.get(_known_grapheme(grapheme)))
+
+@router.get("/audio/{grapheme}/word", response_class=Response, responses={200: {"content": {AUDIO_MEDIA_TYPE: {}}}})
+async def get_grapheme_word_audio(grapheme: str, request: Request, audio: AudioLibrary = Depends(get_audio_library)):
+    """MP3 of the grapheme's phonetic word (PHONEME_MAP_HU)"""
+    word = PHONEME_MAP_HU.get(_known_grapheme(grapheme))
+    if not word:
+        raise HTTPException(status_code=404, detail="No phonetic word for grapheme")
+    return _clip_response(request, await audio.get(word, word=True))
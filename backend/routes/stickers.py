@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Request
+from payloads import StaticPayload
+from sticker_catalog import CATALOG_PAYLOAD, CATALOG_VERSION
+
+router = APIRouter(prefix="/stickers", tags=["stickers"])
+
+# The catalog only changes with a deploy, so it is serialized once
+CATALOG = StaticPayload(CATALOG_PAYLOAD, version=CATALOG_VERSION)
+
+@router.get("/catalog")
+async def get_sticker_catalog(request: Request):
+    """Versioned sticker catalog (ids, names, emoji, descriptions, categories)"""
+    return CATALOG.response(request)
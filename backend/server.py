@@ -1,24 +1,27 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 import logging
+import os
 from pathlib import Path
 
+from database import MongoConnection
+from indexes import ensure_indexes
+from services.rollups import ensure_live_cutoff
+from services.child_service import ChildService
+from audio import AudioLibrary, default_audio_dir
+from services.cache import LRUCache
+from services.session_writer import SessionWriteBuffer
+from responses import FastJSONResponse
+
 # Import route modules
-from routes import children, game
+from routes import admin, children, game, stickers
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'betukkereso')]
-
 # Create the main app without a prefix
-app = FastAPI(title="Betűkereső API", version="1.0.0")
+app = FastAPI(title="Betűkereső API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -31,6 +34,8 @@ async def root():
 # Include route modules
 api_router.include_router(children.router)
 api_router.include_router(game.router)
+api_router.include_router(stickers.router)
+api_router.include_router(admin.router)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -41,6 +46,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # Configure logging
@@ -53,14 +59,64 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_db_client():
     logger.info("Starting up Betűkereső API...")
-    # Test database connection
+    # One client (and connection pool) for the whole process, shared by every request
+    mongo = MongoConnection.from_env()
+    app.state.mongo = mongo
+    # game_sessions log writes are batched off the request path (SESSION_BUFFER_ENABLED=false writes inline)
+    session_writer = None
+    if os.environ.get('SESSION_BUFFER_ENABLED', 'true').lower() in {"true", "1", "yes", "on"}:
+        session_writer = SessionWriteBuffer(
+            mongo.db.game_sessions,
+            max_batch_size=int(os.environ.get('SESSION_BUFFER_MAX_BATCH', 500)),
+            max_queue_size=int(os.environ.get('SESSION_BUFFER_MAX_QUEUE', 10000)),
+            flush_interval=int(os.environ.get('SESSION_BUFFER_FLUSH_INTERVAL_MS', 1000)) / 1000,
+            rollup_collection=mongo.db.session_rollups,
+        )
+        session_writer.start()
+    app.state.session_writer = session_writer
+    # Child documents are served from memory between writes (CHILD_CACHE_SIZE=0 disables).
+    # Per process: with several workers, reads may lag another worker's writes by up to CHILD_CACHE_TTL_SECONDS.
+    child_cache = None
+    if int(os.environ.get('CHILD_CACHE_SIZE', 10000)) > 0:
+        child_cache = LRUCache(
+            maxsize=int(os.environ.get('CHILD_CACHE_SIZE', 10000)),
+            ttl=float(os.environ.get('CHILD_CACHE_TTL_SECONDS', 30)),
+        )
+    app.state.audio = AudioLibrary(
+        default_audio_dir(),
+        max_clips=int(os.environ.get('AUDIO_CACHE_SIZE', 128)),
+        max_file_bytes=int(os.environ.get('AUDIO_CACHE_MAX_FILE_BYTES', 256 * 1024)),
+    )
+    # List endpoints serve stored documents without model validation (VALIDATE_ON_READ=true validates them, e.g. during migrations)
+    app.state.child_service = ChildService(
+        mongo.db,
+        session_writer=session_writer,
+        child_cache=child_cache,
+        validate_on_read=os.environ.get('VALIDATE_ON_READ', 'false').lower() in {"true", "1", "yes", "on"},
+    )
+    # Test database connection, open the minimum pool up front and make sure indexes exist.
+    # Each step is tried on its own, so one failure neither hides nor skips the others.
     try:
-        await db.command("ping")
-        logger.info("Database connection successful")
+        await mongo.warm_up()
+        logger.info(f"Database connection successful (pool min={mongo.min_pool_size}, max={mongo.max_pool_size})")
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
+    try:
+        await ensure_indexes(mongo.db)
+    except Exception as e:
+        logger.error(f"Index creation failed: {e}")
+    try:
+        logger.info(f"Live session rollups since {await ensure_live_cutoff(mongo.db)}")
+    except Exception as e:
+        logger.error(f"Live rollup cutoff setup failed: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
-    logger.info("Database connection closed")
\ No newline at end of file
+    if app.state.session_writer is not None:
+        try:
+            await app.state.session_writer.stop()
+            logger.info(f"Session buffer flushed ({app.state.session_writer.flushed_docs} sessions written)")
+        except Exception as e:
+            logger.error(f"Session buffer flush failed, {app.state.session_writer.depth} sessions lost: {e}")
+    app.state.mongo.close()
+    logger.info("Database connection closed")
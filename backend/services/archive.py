@@ -0,0 +1,230 @@
+"""Compacted history: old game_sessions packed into one compressed block per (child, month).
+
+A block stores the month's sessions as columns (grapheme ordinal into the
+block's own grapheme table, game mode ordinal, correct bit, response time
+with a presence bit, millisecond delta from the previous timestamp),
+zlib-compressed. Session ids and the _id/child_id/index overhead of
+individual documents are not kept.
+"""
+from bson import Binary
+from datetime import datetime, timedelta
+from models import GameMode
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.rollups import rollup_backfill_complete
+from typing import Any, AsyncIterator, Counter, Dict, List, Optional, Tuple
+import collections
+import heapq
+import logging
+import numpy as np
+import struct
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# 2: response time presence as its own bit column (1 stored None as -1)
+BLOCK_FORMAT = 2
+GAME_MODES: Tuple[str, ...] = tuple(mode.value for mode in GameMode)
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+_HEADER = struct.Struct("<BI")  # format, row count
+_FORMAT_1_NO_RESPONSE_TIME = -1
+
+
+def month_start(timestamp: datetime) -> datetime:
+    return datetime(timestamp.year, timestamp.month, 1)
+
+
+def _to_ms(timestamp: datetime) -> int:
+    return (timestamp - _EPOCH) // _MS
+
+
+def _mode(row: Dict[str, Any]) -> str:
+    return getattr(row["game_mode"], "value", row["game_mode"])
+
+
+def encode_block(rows: List[Dict[str, Any]], month: datetime) -> Tuple[List[str], bytes]:
+    """(grapheme table, compressed columns) for rows sorted by timestamp."""
+    graphemes = sorted({row["grapheme"] for row in rows})
+    ordinal = {g: i for i, g in enumerate(graphemes)}
+    timestamps = np.array([_to_ms(row["timestamp"]) for row in rows], dtype=np.int64)
+    columns = [
+        np.array([ordinal[row["grapheme"]] for row in rows], dtype="<u2").tobytes(),
+        np.array([GAME_MODES.index(_mode(row)) for row in rows], dtype="u1").tobytes(),
+        np.packbits(np.array([bool(row["is_correct"]) for row in rows], dtype=bool)).tobytes(),
+        np.packbits(np.array([row.get("response_time") is not None for row in rows], dtype=bool)).tobytes(),
+        np.array([row.get("response_time") or 0 for row in rows], dtype="<i4").tobytes(),
+        np.diff(timestamps, prepend=_to_ms(month)).astype("<u4").tobytes(),
+    ]
+    return graphemes, zlib.compress(_HEADER.pack(BLOCK_FORMAT, len(rows)) + b"".join(columns), 9)
+
+
+def decode_block(block: Dict[str, Any]) -> List[Dict[str, Any]]:
+    raw = zlib.decompress(block["data"])
+    block_format, count = _HEADER.unpack_from(raw)
+    if block_format not in (1, BLOCK_FORMAT):
+        raise ValueError(f"Unsupported archive block format {block_format}")
+    offset = _HEADER.size
+    bits = (None, (count + 7) // 8)
+    sizes = [("<u2", count * 2), ("u1", count), bits] + ([bits] if block_format >= 2 else []) + [("<i4", count * 4), ("<u4", count * 4)]
+    columns = []
+    for dtype, size in sizes:
+        chunk = raw[offset:offset + size]
+        offset += size
+        columns.append(np.unpackbits(np.frombuffer(chunk, dtype="u1"))[:count] if dtype is None else np.frombuffer(chunk, dtype=dtype))
+    if block_format >= 2:
+        grapheme_ordinals, mode_ordinals, correct, timed, response_times, deltas = columns
+    else:
+        grapheme_ordinals, mode_ordinals, correct, response_times, deltas = columns
+        timed = response_times != _FORMAT_1_NO_RESPONSE_TIME
+    timestamps = _to_ms(block["month"]) + np.cumsum(deltas, dtype=np.int64)
+    graphemes = block["graphemes"]
+    return [
+        {
+            "child_id": block["child_id"],
+            "game_mode": GAME_MODES[mode],
+            "grapheme": graphemes[g],
+            "is_correct": bool(c),
+            "response_time": rt if t else None,
+            "timestamp": _EPOCH + timedelta(milliseconds=ts),
+        }
+        for g, mode, c, t, rt, ts in zip(
+            grapheme_ordinals.tolist(), mode_ordinals.tolist(), correct.tolist(), timed.tolist(),
+            response_times.tolist(), timestamps.tolist()
+        )
+    ]
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    # What a block keeps of a session, to recognise rows it already holds
+    return _to_ms(row["timestamp"]), row["grapheme"], _mode(row), bool(row["is_correct"]), row.get("response_time")
+
+
+async def compact_child_sessions(db: AsyncIOMotorDatabase, child_id: str, before: datetime) -> int:
+    """Move the child's sessions of whole months before `before` into archive blocks; returns sessions archived.
+
+    Safe to re-run after an interruption: sessions a block already holds are
+    only deleted, never appended twice.
+    """
+    archived = 0
+    cursor = db.game_sessions.find(
+        {"child_id": child_id, "timestamp": {"$lt": before}},
+        {"_id": 1, "game_mode": 1, "grapheme": 1, "is_correct": 1, "response_time": 1, "timestamp": 1},
+    ).sort("timestamp", 1)
+    month: Optional[datetime] = None
+    rows: List[Dict[str, Any]] = []
+    async for row in cursor:
+        if month is not None and month_start(row["timestamp"]) != month:
+            archived += await _archive_month(db, child_id, month, rows)
+            rows = []
+        month = month_start(row["timestamp"])
+        rows.append(row)
+    if rows:
+        archived += await _archive_month(db, child_id, month, rows)
+    return archived
+
+
+async def _archive_month(db: AsyncIOMotorDatabase, child_id: str, month: datetime, rows: List[Dict[str, Any]]) -> int:
+    block = await db.session_archive.find_one({"child_id": child_id, "month": month})
+    archived_rows = decode_block(block) if block is not None else []
+    # Every row gets deleted below, so any row the block does not hold yet (not
+    # only those after last_ts) is merged in first
+    archived: Counter[Tuple[Any, ...]] = collections.Counter(_row_key(row) for row in archived_rows)
+    new_rows = []
+    for row in rows:
+        key = _row_key(row)
+        if archived[key]:
+            archived[key] -= 1
+        else:
+            new_rows.append(row)
+    if new_rows:
+        merged = archived_rows + new_rows
+        merged.sort(key=lambda row: row["timestamp"])
+        graphemes, data = encode_block(merged, month)
+        await db.session_archive.replace_one(
+            {"child_id": child_id, "month": month},
+            {
+                "child_id": child_id,
+                "month": month,
+                "format": BLOCK_FORMAT,
+                "count": len(merged),
+                "first_ts": merged[0]["timestamp"],
+                "last_ts": merged[-1]["timestamp"],
+                "graphemes": graphemes,
+                "data": Binary(data),
+                "updated_at": datetime.utcnow(),
+            },
+            upsert=True,
+        )
+    # The block is durable now; the originals can go
+    ids = [row["_id"] for row in rows]
+    for i in range(0, len(ids), 1000):
+        await db.game_sessions.delete_many({"_id": {"$in": ids[i:i + 1000]}})
+    return len(new_rows)
+
+
+async def compact_sessions(db: AsyncIOMotorDatabase, older_than_days: int = 180) -> int:
+    """Archive every child's sessions from whole months older than older_than_days.
+
+    Refuses to run before the rollup backfill has completed: it reads only
+    game_sessions, so months archived first would be missing from the stats.
+    """
+    if not await rollup_backfill_complete(db):
+        raise RuntimeError("Run backfill-session-rollups to completion before compacting sessions")
+    before = month_start(datetime.utcnow() - timedelta(days=older_than_days))
+    archived = 0
+    async for child in db.children.find({}, {"_id": 0, "id": 1}):
+        count = await compact_child_sessions(db, child["id"], before)
+        if count:
+            logger.info(f"Archived {count} sessions of child {child['id']} (before {before:%Y-%m})")
+        archived += count
+    return archived
+
+
+async def session_history(db: AsyncIOMotorDatabase, child_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """A child's sessions (archived and live) in timestamp order.
+
+    start is inclusive, end exclusive. Blocks and live rows are walked month
+    by month, so memory is bounded by one decoded block (plus the live rows
+    of its month) and one cursor batch, however long the history. Live rows
+    of an archived month are matched against the block like in
+    _archive_month: those it already holds (an interrupted compaction) are
+    yielded once, those it does not (inserted late) are merged in.
+    """
+    block_query: Dict[str, Any] = {"child_id": child_id}
+    if start is not None:
+        block_query["month"] = {"$gte": month_start(start)}
+    if end is not None:
+        block_query.setdefault("month", {})["$lt"] = end
+    live_query: Dict[str, Any] = {"child_id": child_id}
+    if start is not None or end is not None:
+        live_query["timestamp"] = {k: v for k, v in (("$gte", start), ("$lt", end)) if v is not None}
+    live = db.game_sessions.find(live_query, {"_id": 0}).sort("timestamp", 1).batch_size(batch_size).__aiter__()
+    pending = await anext(live, None)
+
+    async for block in db.session_archive.find(block_query).sort("month", 1).batch_size(1):
+        # Live rows of earlier months that have no block
+        while pending is not None and pending["timestamp"] < block["month"]:
+            yield pending
+            pending = await anext(live, None)
+        archived_rows = decode_block(block)
+        archived: Counter[Tuple[Any, ...]] = collections.Counter(_row_key(row) for row in archived_rows)
+        month_end = month_start(block["month"] + timedelta(days=32))
+        late_rows = []
+        while pending is not None and pending["timestamp"] < month_end:
+            key = _row_key(pending)
+            if archived[key]:
+                archived[key] -= 1
+            else:
+                late_rows.append(pending)
+            pending = await anext(live, None)
+        in_range = (
+            row for row in archived_rows
+            if (start is None or row["timestamp"] >= start) and (end is None or row["timestamp"] < end)
+        )
+        for row in heapq.merge(in_range, late_rows, key=lambda row: row["timestamp"]):
+            yield row
+
+    while pending is not None:
+        yield pending
+        pending = await anext(live, None)
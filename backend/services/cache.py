@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import time
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with an optional per-entry TTL and counters.
+
+    Not thread-safe; it is only used from the event loop.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expired(self, key: Hashable) -> bool:
+        if self.ttl is None or self._expires.get(key, float("inf")) > time.monotonic():
+            return False
+        del self._data[key]
+        del self._expires[key]
+        self.expirations += 1
+        return True
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key not in self._data or self._expired(key):
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return self._data[key]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        # No counters and no recency update; used for write-through patches
+        if key not in self._data or self._expired(key):
+            return None
+        return self._data[key]
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        while len(self._data) > self.maxsize:
+            evicted, _ = self._data.popitem(last=False)
+            self._expires.pop(evicted, None)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if self._data.pop(key, None) is not None:
+            self._expires.pop(key, None)
+            self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+        self._expires.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -1,259 +1,566 @@
-from typing import List, Optional, Dict, Set
-from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Dict, Set, Tuple
+from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from models import (
-    Child, ChildCreate, ChildUpdate, GameSession, GameSessionCreate, 
-    Sticker, ProgressUpdateResponse, GraphemeProgress,
-    HUNGARIAN_GRAPHEMES, FOREIGN_GRAPHEMES, PHONEME_MAP_HU, TROUBLE_GRAPHEMES
+    Child, ChildCreate, ChildUpdate, ChildSettings, ChildStats, ChildSummary, Deck, GameMode, GameSession, GameSessionCreate, 
+    GraphemeProgress, RECENT_WINDOW, Sticker, ProgressUpdateResponse
+)
+from documents import document_reader, model_projection
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, keyset_filter
+from services.archive import session_history
+from services.cache import LRUCache
+from services.deck import build_deck_plan, deal_deck
+from services.grapheme_sampler import AdaptiveGraphemeSampler
+from services.stats import DEFAULT_STATS_DAYS, child_stats_from_facets, child_stats_pipeline
+from services.rollups import apply_rollups, session_day
+from services.session_writer import SessionWriteBuffer
+from sticker_catalog import (
+    STICKER_CATALOG, STICKER_IDS, popcount, sample_collected, sample_uncollected,
+    sticker_mask_field, sticker_mask_from_names, sticker_mask_to_int, sticker_mask_words
 )
 import asyncio
 import random
 
-# 102 egyedi magyar nevű és rövid leírású matrica katalógus
-STICKER_CATALOG: List[Dict[str, str]] = [
-    # Állat Hős (10)
-    {"name": "Állat Hős - Róka", "emoji": "🦊", "desc": "Ravasz és fürge tanuló!"},
-    {"name": "Állat Hős - Medve", "emoji": "🐻", "desc": "Erős kitartás, szuper haladás."},
-    {"name": "Állat Hős - Bagoly", "emoji": "🦉", "desc": "Bölcsen gyakorolsz minden nap."},
-    {"name": "Állat Hős - Delfin", "emoji": "🐬", "desc": "Gyors és okos, ügyes felismerés!"},
-    {"name": "Állat Hős - Nyuszi", "emoji": "🐰", "desc": "Ugrásszerű fejlődés!"},
-    {"name": "Állat Hős - Teknős", "emoji": "🐢", "desc": "Lassan, de biztosan haladsz."},
-    {"name": "Állat Hős - Páva", "emoji": "🦚", "desc": "Színes és ragyogó teljesítmény."},
-    {"name": "Állat Hős - Oroszlán", "emoji": "🦁", "desc": "Bátor és hangos siker!"},
-    {"name": "Állat Hős - Panda", "emoji": "🐼", "desc": "Kedves és kitartó próbálkozás."},
-    {"name": "Állat Hős - Mókus", "emoji": "🐿️", "desc": "Gyorsan gyűjtöd a tudást."},
-    # Jármű Mester (10)
-    {"name": "Jármű Mester - Autó", "emoji": "🚗", "desc": "Száguld a fejlődés!"},
-    {"name": "Jármű Mester - Vonat", "emoji": "🚆", "desc": "Folyamatos haladás, mint a vonat."},
-    {"name": "Jármű Mester - Repülő", "emoji": "✈️", "desc": "Magasba emelkedő eredmények."},
-    {"name": "Jármű Mester - Hajó", "emoji": "🛳️", "desc": "Stabil haladás a betűk tengerén."},
-    {"name": "Jármű Mester - Tűzoltó", "emoji": "🚒", "desc": "Tűzoltó gyorsaságával javítasz!"},
-    {"name": "Jármű Mester - Mentő", "emoji": "🚑", "desc": "Segítsz magadnak jobban olvasni."},
-    {"name": "Jármű Mester - Busz", "emoji": "🚌", "desc": "Sok állomáson át vezet az utad."},
-    {"name": "Jármű Mester - Traktor", "emoji": "🚜", "desc": "Erősen húzod a tanulást előre."},
-    {"name": "Jármű Mester - Versenyautó", "emoji": "🏎️", "desc": "Villámgyors felismerések!"},
-    {"name": "Jármű Mester - Helikopter", "emoji": "🚁", "desc": "Felülről is átlátod a betűket."},
-    # Természet Felfedező (10)
-    {"name": "Természet Felfedező - Fa", "emoji": "🌳", "desc": "Erős alap, egyre magasabb ágak."},
-    {"name": "Természet Felfedező - Virág", "emoji": "🌸", "desc": "Kinyílik a tudásod."},
-    {"name": "Természet Felfedező - Hegy", "emoji": "⛰️", "desc": "Csúcsra törő teljesítmény."},
-    {"name": "Természet Felfedező - Nap", "emoji": "☀️", "desc": "Ragyogó eredmények nap mint nap."},
-    {"name": "Természet Felfedező - Hold", "emoji": "🌙", "desc": "Csendes, de biztos haladás."},
-    {"name": "Természet Felfedező - Csillag", "emoji": "⭐", "desc": "Csillogó sikerek sorozata."},
-    {"name": "Természet Felfedező - Felhő", "emoji": "☁️", "desc": "Könnyed tanulás, mint a pelyhek."},
-    {"name": "Természet Felfedező - Szivárvány", "emoji": "🌈", "desc": "Színes és örömteli fejlődés."},
-    {"name": "Természet Felfedező - Tenger", "emoji": "🌊", "desc": "Mély és gazdag tudás hullámzik."},
-    {"name": "Természet Felfedező - Tűz", "emoji": "🔥", "desc": "Lángoló lelkesedés a betűkért."},
-    # Sport Bajnok (10)
-    {"name": "Sport Bajnok - Foci", "emoji": "⚽", "desc": "Gólt rúgsz minden jó válasszal!"},
-    {"name": "Sport Bajnok - Kosár", "emoji": "🏀", "desc": "Hárompontos teljesítmény!"},
-    {"name": "Sport Bajnok - Tenisz", "emoji": "🎾", "desc": "Ütős felismerések!"},
-    {"name": "Sport Bajnok - Úszás", "emoji": "🏊", "desc": "Úszol a sikerben!"},
-    {"name": "Sport Bajnok - Futás", "emoji": "🏃", "desc": "Gyors tempóban haladsz előre."},
-    {"name": "Sport Bajnok - Bicikli", "emoji": "🚴", "desc": "Kiegyensúlyozott fejlődés."},
-    {"name": "Sport Bajnok - Torna", "emoji": "🤸", "desc": "Hajlékony gondolkodás, remek forma."},
-    {"name": "Sport Bajnok - Jéghoki", "emoji": "🏒", "desc": "Jéghideg koncentráció, pontos találat."},
-    {"name": "Sport Bajnok - Sí", "emoji": "⛷️", "desc": "Lejtmenetben is stabil a tudás."},
-    {"name": "Sport Bajnok - Judo", "emoji": "🥋", "desc": "Fegyelem és erő a tanulásban."},
-    # Űr Utazó (10)
-    {"name": "Űr Utazó - Rakéta", "emoji": "🚀", "desc": "Kilősz a tudás világába!"},
-    {"name": "Űr Utazó - Bolygó", "emoji": "🪐", "desc": "Új betűvilágokat fedezel fel."},
-    {"name": "Űr Utazó - Csillag", "emoji": "🌟", "desc": "Ragyogó teljesítmény az égen."},
-    {"name": "Űr Utazó - Űrhajós", "emoji": "👩‍🚀", "desc": "Bátor felfedező vagy!"},
-    {"name": "Űr Utazó - Távcső", "emoji": "🔭", "desc": "Éles szemmel figyelsz a részletekre."},
-    {"name": "Űr Utazó - Meteorit", "emoji": "☄️", "desc": "Száguldó siker!"},
-    {"name": "Űr Utazó - Holdbázis", "emoji": "🏚️", "desc": "Biztos bázis a tudásnak."},
-    {"name": "Űr Utazó - Galaxis", "emoji": "🌌", "desc": "Táguló tudáshorizont."},
-    {"name": "Űr Utazó - Rover", "emoji": "🤖", "desc": "Kitartóan kutatsz és tanulsz."},
-    {"name": "Űr Utazó - Antenna", "emoji": "📡", "desc": "Jeleket fogsz – megérted a betűket."},
-    # Zenei Csillag (10)
-    {"name": "Zenei Csillag - Hegedű", "emoji": "🎻", "desc": "Harmonikus fejlődés."},
-    {"name": "Zenei Csillag - Zongora", "emoji": "🎹", "desc": "Pontosan játszol a betűkkel."},
-    {"name": "Zenei Csillag - Gitár", "emoji": "🎸", "desc": "Pengeted a tudás húrjait."},
-    {"name": "Zenei Csillag - Dob", "emoji": "🥁", "desc": "Jó ritmusban haladsz."},
-    {"name": "Zenei Csillag - Fuvola", "emoji": "🎶", "desc": "Könnyed és tiszta megoldások."},
-    {"name": "Zenei Csillag - Mikrofon", "emoji": "🎤", "desc": "Hangosan kimondod a helyeset."},
-    {"name": "Zenei Csillag - Hangjegy", "emoji": "🎵", "desc": "Minden válaszod zenél."},
-    {"name": "Zenei Csillag - Szaxofon", "emoji": "🎷", "desc": "Egyedi hangon szól a tudás."},
-    {"name": "Zenei Csillag - Trombita", "emoji": "🎺", "desc": "Fényes sikerfanfár!"},
-    {"name": "Zenei Csillag - Dj Pult", "emoji": "🎧", "desc": "Te kevered a tudást profin."},
-    # Iskolai Hős (10)
-    {"name": "Iskolai Hős - Könyv", "emoji": "📚", "desc": "A könyvek barátja vagy."},
-    {"name": "Iskolai Hős - Ceruza", "emoji": "✏️", "desc": "Pontosan írsz és rajzolsz."},
-    {"name": "Iskolai Hős - Radír", "emoji": "🧽", "desc": "Hibátlanítás mestere."},
-    {"name": "Iskolai Hős - Táska", "emoji": "🎒", "desc": "Mindig felkészült vagy."},
-    {"name": "Iskolai Hős - Számológép", "emoji": "🧮", "desc": "Okos számolás, okos észrevétel."},
-    {"name": "Iskolai Hős - Ecset", "emoji": "🖌️", "desc": "Szép és pontos vonalak."},
-    {"name": "Iskolai Hős - Vonalzó", "emoji": "📏", "desc": "Rendszerető és precíz."},
-    {"name": "Iskolai Hős - Földgömb", "emoji": "🌍", "desc": "Világlátó tudás."},
-    {"name": "Iskolai Hős - Óra", "emoji": "⏰", "desc": "Jó tempóban tanulsz."},
-    {"name": "Iskolai Hős - Diploma", "emoji": "🎓", "desc": "Igazi kis tudós!"},
-    # Étel Rajongó (10)
-    {"name": "Étel Rajongó - Alma", "emoji": "🍎", "desc": "Egészséges tudással tele."},
-    {"name": "Étel Rajongó - Banán", "emoji": "🍌", "desc": "Energiával teli tanulás."},
-    {"name": "Étel Rajongó - Szőlő", "emoji": "🍇", "desc": "Apró lépésekkel nagy eredmény."},
-    {"name": "Étel Rajongó - Eper", "emoji": "🍓", "desc": "Édes siker!"},
-    {"name": "Étel Rajongó - Dinnye", "emoji": "🍉", "desc": "Nagy falatokban haladsz."},
-    {"name": "Étel Rajongó - Sajt", "emoji": "🧀", "desc": "Okos mint egy kisegér."},
-    {"name": "Étel Rajongó - Pizza", "emoji": "🍕", "desc": "Minden szeletben tudás van."},
-    {"name": "Étel Rajongó - Szendvics", "emoji": "🥪", "desc": "Rétegenként épül a tudás."},
-    {"name": "Étel Rajongó - Leves", "emoji": "🍲", "desc": "Melengető, tápláló fejlődés."},
-    {"name": "Étel Rajongó - Süti", "emoji": "🍪", "desc": "Jutalomfalat a jó válaszokért."},
-    # Formák Mágusa (10)
-    {"name": "Formák Mágusa - Kör", "emoji": "⚪", "desc": "Kerek a tudásod!"},
-    {"name": "Formák Mágusa - Négyzet", "emoji": "🟥", "desc": "Stabil és szilárd alapok."},
-    {"name": "Formák Mágusa - Háromszög", "emoji": "🔺", "desc": "Háromszor is meggondolt válaszok."},
-    {"name": "Formák Mágusa - Csillag", "emoji": "⭐", "desc": "Csillagfényű felismerések."},
-    {"name": "Formák Mágusa - Szív", "emoji": "❤️", "desc": "Szívvel-lélekkel tanulsz."},
-    {"name": "Formák Mágusa - Gyémánt", "emoji": "💎", "desc": "Csiszolt tudás, fényes siker."},
-    {"name": "Formák Mágusa - Nyíl", "emoji": "➡️", "desc": "Mindig jó irányba haladsz."},
-    {"name": "Formák Mágusa - Spirál", "emoji": "🌀", "desc": "Felfelé ívelő tudás."},
-    {"name": "Formák Mágusa - Puzzle", "emoji": "🧩", "desc": "Összeáll a nagy kép."},
-    {"name": "Formák Mágusa - Csepp", "emoji": "💧", "desc": "Apránként töltődik a tudás."},
-    # Extra Állatok (12)
-    {"name": "Állat Hős - Zsiráf", "emoji": "🦒", "desc": "Magasra nyújtózó célok."},
-    {"name": "Állat Hős - Pingvin", "emoji": "🐧", "desc": "Elegáns és kitartó lépések."},
-    {"name": "Állat Hős - Bálna", "emoji": "🐋", "desc": "Óriási tudás hullámzik benned."},
-    {"name": "Állat Hős - Ló", "emoji": "🐴", "desc": "Fürge és erős haladás."},
-    {"name": "Állat Hős - Egér", "emoji": "🐭", "desc": "Apró, de bátor lépések."},
-    {"name": "Állat Hős - Koala", "emoji": "🐨", "desc": "Nyugodt, biztos fejlődés."},
-    {"name": "Állat Hős - Farkas", "emoji": "🐺", "desc": "Okos csapatjátékos a betűk között."},
-    {"name": "Állat Hős - Víziló", "emoji": "🦛", "desc": "Súlyos érvekkel nyersz."},
-    {"name": "Állat Hős - Pulyka", "emoji": "🦃", "desc": "Hangosan ünnepled a sikert."},
-    {"name": "Állat Hős - Polip", "emoji": "🐙", "desc": "Sokoldalúan kezeled a feladatokat."},
-    {"name": "Állat Hős - Kenguru", "emoji": "🦘", "desc": "Nagy ugrások a tudásban."},
-    {"name": "Állat Hős - Csiga", "emoji": "🐌", "desc": "Lassú, de kitartó haladás."},
-]
+def child_projection(fields: str) -> Dict[str, int]:
+    """Mongo projection for a fields= parameter: "summary" or comma-separated Child fields.
+
+    Dotted paths into nested fields are allowed (e.g. "settings.letter_case",
+    "progress.cs"); id is always included.
+    """
+    if fields.strip() == "summary":
+        names = list(ChildSummary.model_fields)
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        parts = name.split(".")
+        if parts[0] not in Child.model_fields or "$" in name or not all(parts):
+            raise ValueError(f"Unknown field: {name}")
+    # A parent path and its child path in one projection is a Mongo path collision
+    names = [n for n in names if not any(n.startswith(other + ".") for other in names)]
+    projection = {"_id": 0, "id": 1}
+    projection.update({name: 1 for name in names})
+    return projection
+
+RECENT_MASK = (1 << RECENT_WINDOW) - 1
+
+def stars_for(recent: int, recent_count: int) -> int:
+    """Stars from the accuracy over the recent answers bitfield (GraphemeProgress.recent)."""
+    return min(3, int(popcount(recent) / recent_count * 4)) if recent_count else 0
+
+def push_recent(recent: int, recent_count: int, is_correct: bool) -> Tuple[int, int]:
+    """The recent answers bitfield and count after one more answer."""
+    return (recent << 1 | is_correct) & RECENT_MASK, min(recent_count + 1, RECENT_WINDOW)
+
+# GraphemeProgress fields maintained with $inc by the batch path
+PROGRESS_COUNTERS = ("attempts", "correct", "timed_attempts", "response_time_sum")
+
+def popcount_expression(value: Any, bits: int = RECENT_WINDOW) -> Dict[str, Any]:
+    """Aggregation expression counting the set bits among the low `bits` bits of a non-negative integer."""
+    # Unrolled: bit i is floor(value / 2^i) mod 2
+    return {"$add": [{"$mod": [{"$floor": {"$divide": [value, 1 << i]}}, 2]} for i in range(bits)]}
+
+def progress_update_pipeline(grapheme: str, is_correct: bool, now: datetime, response_time: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Update pipeline applying one answer to streak and progress server-side.
+
+    The recent answers bitfield is shifted arithmetically (x * 2 + bit, mod
+    2^RECENT_WINDOW) and stars are derived from it in a second stage, so the
+    whole update is a single atomic document write (no read-modify-write race).
+    The formulas mirror push_recent() and stars_for() (tests/test_progress.py
+    checks them against each other).
+
+    updated_at never moves backwards (now, or the stored value if that is
+    later), so the returned documents of concurrent answers can be ordered
+    by it (_patch_cached_progress).
+    """
+    path = f"progress.{grapheme}"
+    attempts = {"$ifNull": [f"${path}.attempts", 0]}
+    correct = {"$ifNull": [f"${path}.correct", 0]}
+    recent = {"$ifNull": [f"${path}.recent", 0]}
+    counters = {
+        f"{path}.attempts": {"$add": [attempts, 1]},
+        f"{path}.correct": {"$add": [correct, 1 if is_correct else 0]},
+        f"{path}.recent": {"$toInt": {"$mod": [{"$add": [{"$multiply": [recent, 2]}, 1 if is_correct else 0]}, RECENT_MASK + 1]}},
+        f"{path}.recent_count": {"$min": [RECENT_WINDOW, {"$add": [{"$ifNull": [f"${path}.recent_count", 0]}, 1]}]},
+        "streak": {"$add": [{"$ifNull": ["$streak", 0]}, 1]} if is_correct else {"$literal": 0},
+        "updated_at": {"$max": [now, "$updated_at"]},
+    }
+    if response_time is not None:
+        counters[f"{path}.timed_attempts"] = {"$add": [{"$ifNull": [f"${path}.timed_attempts", 0]}, 1]}
+        counters[f"{path}.response_time_sum"] = {"$add": [{"$ifNull": [f"${path}.response_time_sum", 0]}, response_time]}
+    return [
+        {"$set": counters},
+        {"$set": {
+            f"{path}.stars": {"$min": [3, {"$toInt": {"$floor": {
+                "$multiply": [{"$divide": [popcount_expression(f"${path}.recent"), f"${path}.recent_count"]}, 4]
+            }}}]},
+        }},
+    ]
+
+def progress_update_projection(*graphemes: str) -> Dict[str, int]:
+    # Only what ProgressUpdateResponse and the sticker decision need
+    projection = {
+        "_id": 0,
+        "streak": 1,
+        "updated_at": 1,
+        "total_stickers": 1,
+        "sticker_mask": 1,
+        "unique_stickers": 1,
+        "settings.streak_thresholds": 1,
+        "settings.stickers_enabled": 1,
+        "settings.additional_sticker_interval": 1,
+    }
+    for grapheme in graphemes:
+        projection[f"progress.{grapheme}"] = 1
+    return projection
+
+def should_award_sticker(settings: ChildSettings, new_streak: int, is_correct: bool) -> bool:
+    # ALWAYS tries to award at thresholds; choose_sticker controls NEW vs DUPLICATE probability
+    stickers_enabled = getattr(settings, "stickers_enabled", True) is True
+    interval = getattr(settings, "additional_sticker_interval", 0)
+    should_award_threshold = (
+        is_correct and (
+            new_streak in settings.streak_thresholds or
+            (interval and interval > 0 and new_streak >= 10 and (new_streak - 10) % interval == 0)
+        )
+    )
+    return bool(stickers_enabled and should_award_threshold)
+
+def choose_sticker(collected_mask: int) -> int:
+    """Pick a catalog id given the child's collected-sticker bitset."""
+    unique_count = popcount(collected_mask)
+
+    # Base: uniform random across full catalog until 20 egyedi matrica
+    if unique_count <= 20 or unique_count >= len(STICKER_CATALOG):
+        # 20 egyedi matricáig: teljesen véletlenszerű választás a teljes katalógusból
+        return random.randrange(len(STICKER_CATALOG))
+    # 20 egyedi után: az ÚJ matrica esélye minden új egyedi után 1%-kal csökken
+    # Példa: 21 egyedi → 99% esély ÚJ, 30 egyedi → 90% esély ÚJ, stb.
+    new_prob = max(0.0, 1.0 - (unique_count - 20) * 0.01)
+    if random.random() < new_prob:
+        return sample_uncollected(collected_mask)
+    return sample_collected(collected_mask)
 
 class ChildService:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncIOMotorDatabase, session_writer: Optional[SessionWriteBuffer] = None,
+                 child_cache: Optional[LRUCache] = None, grapheme_sampler: Optional[AdaptiveGraphemeSampler] = None,
+                 validate_on_read: bool = False):
         self.db = db
         self.children_collection = db.children
         self.sessions_collection = db.game_sessions
         self.stickers_collection = db.stickers
+        self.rollups_collection = db.session_rollups
+        self.archive_collection = db.session_archive
+        # When set, session log inserts are written behind instead of on the request path
+        self.session_writer = session_writer
+        # Validated Child models by id, kept current by every mutation in this service.
+        # The cache is per process: with several workers, a write taken by another
+        # worker only becomes visible here once the entry expires (TTL).
+        self.child_cache = child_cache
+        # Per-child practice weights, updated by the progress writes below
+        self.grapheme_sampler = grapheme_sampler if grapheme_sampler is not None else AdaptiveGraphemeSampler()
+        # Aggregated session statistics per child as (child's updated_at, {days: ChildStats}).
+        # Every progress write moves updated_at, so an entry is only served while the stored
+        # updated_at still matches, whichever worker took the write. The TTL bounds how long
+        # sessions still in another worker's write-behind buffer can be missing from an entry.
+        self.stats_cache = LRUCache(maxsize=1000, ttl=60)
+        # List endpoints return the stored documents, only normalized to the model's fields,
+        # unless validate_on_read is set (documents.py)
+        self.child_document = document_reader(Child, validate_on_read)
+        self.sticker_document = document_reader(Sticker, validate_on_read)
+
+    def _cache_child(self, child: Child) -> Child:
+        if self.child_cache is not None:
+            self.child_cache.put(child.id, child)
+        return child
+
+    def _invalidate_child(self, child_id: str):
+        if self.child_cache is not None:
+            self.child_cache.invalidate(child_id)
+
+    def _progress_written(self, child_id: str):
+        self.stats_cache.invalidate(child_id)
+
+    async def _log_sessions(self, session_docs: List[Dict[str, Any]]):
+        if self.session_writer is not None:
+            await self.session_writer.put_many(session_docs)
+        else:
+            await self.sessions_collection.insert_many(session_docs)
+            await apply_rollups(self.rollups_collection, session_docs)
 
     async def create_child(self, child_data: ChildCreate) -> Child:
         child = Child(name=child_data.name)
         child_dict = child.dict()
         await self.children_collection.insert_one(child_dict)
-        return child
+        return self._cache_child(child)
+
+    async def _children_page(self, projection: Optional[Dict[str, int]], limit: int, after: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # One page of raw documents in (created_at, id) order and the cursor of the next page
+        cursor = self.children_collection.find(keyset_filter("created_at", after), projection) \
+            .sort([("created_at", 1), ("id", 1)]).limit(limit + 1)
+        children_data = await cursor.to_list(length=limit + 1)
+        next_cursor = None
+        if len(children_data) > limit:
+            children_data = children_data[:limit]
+            next_cursor = encode_cursor(children_data[-1]["created_at"], children_data[-1]["id"])
+        return children_data, next_cursor
+
+    async def get_children(self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of children as Child-shaped documents (see documents.py) and the cursor of the next page."""
+        children_data, next_cursor = await self._children_page(model_projection(Child), limit, after)
+        return [self.child_document(child) for child in children_data], next_cursor
 
-    async def get_children(self) -> List[Child]:
-        cursor = self.children_collection.find()
-        children_data = await cursor.to_list(length=None)
-        return [Child(**child) for child in children_data]
+    async def get_children_fields(self, projection: Dict[str, int], limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Like get_children, but only the projected fields and without model validation."""
+        # The cursor needs created_at even when the caller did not ask for it
+        strip_created_at = "created_at" not in projection
+        children_data, next_cursor = await self._children_page({**projection, "created_at": 1}, limit, after)
+        if strip_created_at:
+            for child in children_data:
+                child.pop("created_at", None)
+        return children_data, next_cursor
+
+    async def count_children(self) -> int:
+        # Collection metadata, no scan
+        return await self.children_collection.estimated_document_count()
 
     async def get_child(self, child_id: str) -> Optional[Child]:
+        if self.child_cache is not None:
+            cached = self.child_cache.get(child_id)
+            if cached is not None:
+                return cached
         child_data = await self.children_collection.find_one({"id": child_id})
-        return Child(**child_data) if child_data else None
+        return self._cache_child(Child(**child_data)) if child_data else None
+
+    async def get_child_fields(self, child_id: str, projection: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        return await self.children_collection.find_one({"id": child_id}, projection)
+
+    async def get_child_progress(self, child_id: str) -> Optional[Dict[str, GraphemeProgress]]:
+        if self.child_cache is not None:
+            cached = self.child_cache.get(child_id)
+            if cached is not None:
+                return cached.progress
+        child_data = await self.children_collection.find_one({"id": child_id}, {"_id": 0, "progress": 1})
+        if child_data is None:
+            return None
+        return {g: GraphemeProgress(**p) for g, p in child_data.get("progress", {}).items()}
+
+    async def get_adaptive_graphemes(self, child_id: str, count: int, include_foreign: bool = False) -> Optional[List[str]]:
+        """A round weighted towards the child's weak, new and slow graphemes; None if there is no such child."""
+        weights = self.grapheme_sampler.get(child_id, include_foreign)
+        if weights is None:
+            progress = await self.get_child_progress(child_id)
+            if progress is None:
+                return None
+            weights = self.grapheme_sampler.load(child_id, include_foreign, progress)
+        return weights.sample(count)
+
+    async def get_deck(self, child_id: str, game_mode: GameMode) -> Optional[Deck]:
+        """Every round of one game session, built from the child's settings; None if there is no such child."""
+        child = await self.get_child(child_id)
+        if child is None:
+            return None
+        # Deriving the plan from the settings is a few lookups; only dealing the rounds costs anything
+        return deal_deck(child_id, build_deck_plan(child.settings), game_mode)
+
+    async def get_child_stats(self, child_id: str, days: int = DEFAULT_STATS_DAYS) -> Optional[ChildStats]:
+        """Accuracy per grapheme and game mode, response times and daily trend over the last days; None if there is no such child."""
+        # Not through the child cache: it may lag other workers' writes
+        child_data = await self.children_collection.find_one({"id": child_id}, {"_id": 0, "updated_at": 1})
+        if child_data is None:
+            return None
+        updated_at = child_data.get("updated_at")
+        cached = self.stats_cache.get(child_id)
+        if cached is not None and cached[0] == updated_at and days in cached[1]:
+            return cached[1][days]
+        if self.session_writer is not None:
+            # Answers still in the write-behind buffer are not in the rollups yet
+            await self.session_writer.flush()
+        today = session_day(datetime.utcnow())
+        since = today - timedelta(days=days - 1)
+        facets = await self.rollups_collection.aggregate(child_stats_pipeline(child_id, since, today)).to_list(length=1)
+        stats = child_stats_from_facets(child_id, days, since, facets[0])
+        # Keyed on updated_at as read before the aggregation: a write during it makes the entry stale
+        previous = self.stats_cache.peek(child_id)
+        by_days = previous[1] if previous is not None and previous[0] == updated_at else {}
+        self.stats_cache.put(child_id, (updated_at, {**by_days, days: stats}))
+        return stats
+
+    async def get_session_history(self, child_id: str, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None) -> Optional[AsyncIterator[Dict[str, Any]]]:
+        """The child's sessions (archived and live) in timestamp order, streamed; None if there is no such child."""
+        if await self.get_child(child_id) is None:
+            return None
+        if self.session_writer is not None:
+            await self.session_writer.flush()
+        # Stored timestamps are naive UTC
+        start, end = (t.astimezone(timezone.utc).replace(tzinfo=None) if t and t.tzinfo else t for t in (start, end))
+        return session_history(self.db, child_id, start, end)
 
     async def delete_child(self, child_id: str) -> bool:
+        if self.session_writer is not None:
+            # Buffered sessions of this child would otherwise be written after the cascade delete
+            await self.session_writer.flush()
         tasks = [
             self.children_collection.delete_one({"id": child_id}),
             self.sessions_collection.delete_many({"child_id": child_id}),
+            self.rollups_collection.delete_many({"child_id": child_id}),
+            self.archive_collection.delete_many({"child_id": child_id}),
             self.stickers_collection.delete_many({"child_id": child_id})
         ]
         results = await asyncio.gather(*tasks)
+        self.forget_children([child_id])
         return results[0].deleted_count > 0
 
+    def forget_children(self, child_ids: List[str]):
+        """Drop everything cached about these children, after their data was replaced or deleted."""
+        for child_id in child_ids:
+            self._invalidate_child(child_id)
+            self.grapheme_sampler.invalidate(child_id)
+            self._progress_written(child_id)
+
     async def update_child(self, child_id: str, update_data: ChildUpdate) -> Optional[Child]:
         update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
-        result = await self.children_collection.update_one(
-            {"id": child_id}, 
-            {"$set": update_dict}
+        child_data = await self.children_collection.find_one_and_update(
+            {"id": child_id},
+            {"$set": update_dict},
+            return_document=ReturnDocument.AFTER,
         )
-        if result.modified_count > 0:
-            return await self.get_child(child_id)
-        return None
+        return self._cache_child(Child(**child_data)) if child_data else None
 
     async def record_game_session(self, child_id: str, session_data: GameSessionCreate) -> ProgressUpdateResponse:
         session = GameSession(child_id=child_id, **session_data.dict())
-        await self.sessions_collection.insert_one(session.dict())
+        grapheme = session_data.grapheme
+        now = datetime.utcnow()
 
-        child = await self.get_child(child_id)
-        if not child:
+        # The session log insert and the progress update are independent, so they share one round trip
+        _, child_doc = await asyncio.gather(
+            self._log_sessions([session.dict()]),
+            self.children_collection.find_one_and_update(
+                {"id": child_id},
+                progress_update_pipeline(grapheme, session_data.is_correct, now, session_data.response_time),
+                projection=progress_update_projection(grapheme),
+                return_document=ReturnDocument.AFTER,
+            ),
+        )
+        if not child_doc:
             raise ValueError("Child not found")
 
-        new_streak = child.streak + 1 if session_data.is_correct else 0
-
-        grapheme = session_data.grapheme
-        if grapheme not in child.progress:
-            child.progress[grapheme] = GraphemeProgress()
-        child.progress[grapheme].attempts += 1
-        if session_data.is_correct:
-            child.progress[grapheme].correct += 1
+        new_streak = child_doc["streak"]
+        new_stars = child_doc["progress"][grapheme]["stars"]
+        self.grapheme_sampler.update(child_id, grapheme, GraphemeProgress(**child_doc["progress"][grapheme]))
+        self._progress_written(child_id)
+        total_stickers = child_doc.get("total_stickers", 0)
+        settings = ChildSettings(**child_doc.get("settings", {}))
 
-        accuracy = child.progress[grapheme].correct / child.progress[grapheme].attempts
-        new_stars = min(3, int(accuracy * 4))
-        child.progress[grapheme].stars = new_stars
-
-        # Sticker awarding logic (ALWAYS tries to award at thresholds; controls NEW vs DUPLICATE probability)
         sticker_earned = None
-        stickers_enabled = getattr(child.settings, "stickers_enabled", True) is True
-        interval = getattr(child.settings, "additional_sticker_interval", 0)
-        should_award_threshold = (
-            session_data.is_correct and (
-                new_streak in child.settings.streak_thresholds or
-                (interval and interval > 0 and new_streak >= 10 and (new_streak - 10) % interval == 0)
-            )
+        if should_award_sticker(settings, new_streak, session_data.is_correct):
+            sticker_earned = await self._award_sticker(child_id, new_streak, child_doc)
+            total_stickers += 1
+            # Bit and counters were updated with a separate, conditional write
+            self._invalidate_child(child_id)
+        else:
+            self._patch_cached_progress(child_id, grapheme, child_doc)
+
+        return ProgressUpdateResponse(
+            new_streak=new_streak,
+            new_stars=new_stars,
+            sticker_earned=sticker_earned,
+            total_stickers=total_stickers
         )
-        if stickers_enabled and should_award_threshold:
-            # Determine unique stickers the child has (by name)
-            unique_names: Set[str] = set()
-            async for s in self.stickers_collection.find({"child_id": child_id}, {"name": 1}):
-                if s.get("name"):
-                    unique_names.add(s["name"])
-            unique_count = len(unique_names)
-
-            # Build uncollected and collected pools by name
-            uncollected = [item for item in STICKER_CATALOG if item["name"] not in unique_names]
-            collected = [item for item in STICKER_CATALOG if item["name"] in unique_names]
-
-            # Base: uniform random across full catalog until 20 egyedi matrica
-            if unique_count <= 20 or len(uncollected) == 0 or len(collected) == 0:
-                # 20 egyedi matricáig: teljesen véletlenszerű választás a teljes katalógusból
-                chosen = random.choice(STICKER_CATALOG)
-            else:
-                # 20 egyedi után: az ÚJ matrica esélye minden új egyedi után 1%-kal csökken
-                # Példa: 21 egyedi → 99% esély ÚJ, 30 egyedi → 90% esély ÚJ, stb.
-                new_prob = max(0.0, 1.0 - (unique_count - 20) * 0.01)
-                if random.random() < new_prob and len(uncollected) > 0:
-                    chosen = random.choice(uncollected)
-                else:
-                    # Ha nincs begyűjtött, essünk vissza az újakra (ritka eset)
-                    chosen = random.choice(collected if len(collected) > 0 else (uncollected if len(uncollected) > 0 else STICKER_CATALOG))
-
-            sticker = Sticker(
-                child_id=child_id,
-                name=chosen["name"],
-                emoji=chosen["emoji"],
-                description=chosen.get("desc"),
-                streak_level=new_streak
+
+    async def record_game_sessions(self, child_id: str, sessions_data: List[GameSessionCreate]) -> List[ProgressUpdateResponse]:
+        """Apply an ordered batch of answers with record_game_session semantics.
+
+        The child is read once, streak/stars/stickers are replayed in order in
+        memory, then sessions, stickers and the child are each written once.
+        Counters use $inc so they stay exact under concurrent writers.
+        """
+        graphemes = list(dict.fromkeys(s.grapheme for s in sessions_data))
+        child_doc = await self.children_collection.find_one({"id": child_id}, progress_update_projection(*graphemes))
+        if not child_doc:
+            raise ValueError("Child not found")
+
+        settings = ChildSettings(**child_doc.get("settings", {}))
+        stored_progress = child_doc.get("progress", {})
+        progress = {
+            g: {k: stored_progress.get(g, {}).get(k, 0) for k in PROGRESS_COUNTERS + ("recent", "recent_count")}
+            for g in graphemes
+        }
+        streak = child_doc.get("streak", 0)
+        total_stickers = child_doc.get("total_stickers", 0)
+        collected_mask: Optional[int] = None
+        stored_mask = 0
+        newly_collected = 0
+
+        responses: List[ProgressUpdateResponse] = []
+        session_docs: List[Dict[str, Any]] = []
+        sticker_docs: List[Dict[str, Any]] = []
+        for session_data in sessions_data:
+            session_docs.append(GameSession(child_id=child_id, **session_data.dict()).dict())
+            grapheme_progress = progress[session_data.grapheme]
+            grapheme_progress["attempts"] += 1
+            if session_data.is_correct:
+                grapheme_progress["correct"] += 1
+            if session_data.response_time is not None:
+                grapheme_progress["timed_attempts"] += 1
+                grapheme_progress["response_time_sum"] += session_data.response_time
+            grapheme_progress["recent"], grapheme_progress["recent_count"] = push_recent(
+                grapheme_progress["recent"], grapheme_progress["recent_count"], session_data.is_correct
             )
-            await self.stickers_collection.insert_one(sticker.dict())
-            sticker_earned = sticker
-            child.total_stickers += 1
+            streak = streak + 1 if session_data.is_correct else 0
+
+            sticker_earned = None
+            if should_award_sticker(settings, streak, session_data.is_correct):
+                if collected_mask is None:
+                    stored_mask = collected_mask = await self._collected_sticker_mask(child_id, child_doc)
+                sticker_id = choose_sticker(collected_mask)
+                if not collected_mask >> sticker_id & 1:
+                    collected_mask |= 1 << sticker_id
+                    newly_collected += 1
+                sticker_earned = self._new_sticker(child_id, sticker_id, streak)
+                sticker_docs.append(sticker_earned.dict())
+                total_stickers += 1
+
+            responses.append(ProgressUpdateResponse(
+                new_streak=streak,
+                new_stars=stars_for(grapheme_progress["recent"], grapheme_progress["recent_count"]),
+                sticker_earned=sticker_earned,
+                total_stickers=total_stickers
+            ))
 
-        child.streak = new_streak
-        child.updated_at = datetime.utcnow()
+        inc: Dict[str, int] = {"total_stickers": len(sticker_docs)}
+        update_set: Dict[str, Any] = {"streak": streak, "updated_at": datetime.utcnow()}
+        for grapheme, grapheme_progress in progress.items():
+            stored = stored_progress.get(grapheme, {})
+            for counter in PROGRESS_COUNTERS:
+                if grapheme_progress[counter] != stored.get(counter, 0):
+                    inc[f"progress.{grapheme}.{counter}"] = grapheme_progress[counter] - stored.get(counter, 0)
+            # The bitfield is not additive: last writer wins, like stars
+            update_set[f"progress.{grapheme}.recent"] = grapheme_progress["recent"]
+            update_set[f"progress.{grapheme}.recent_count"] = grapheme_progress["recent_count"]
+            update_set[f"progress.{grapheme}.stars"] = stars_for(grapheme_progress["recent"], grapheme_progress["recent_count"])
+        update: Dict[str, Any] = {"$inc": inc, "$set": update_set}
 
+        writes = [
+            self._log_sessions(session_docs),
+            self.children_collection.update_one({"id": child_id}, update),
+        ]
+        if sticker_docs:
+            writes.append(self.stickers_collection.insert_many(sticker_docs))
+        if newly_collected:
+            writes.append(self._mark_stickers_collected(child_id, collected_mask & ~stored_mask))
+        await asyncio.gather(*writes)
+        self._invalidate_child(child_id)
+        self._progress_written(child_id)
+        for grapheme, grapheme_progress in progress.items():
+            self.grapheme_sampler.update(child_id, grapheme, GraphemeProgress(**grapheme_progress))
+        return responses
+
+    def _patch_cached_progress(self, child_id: str, grapheme: str, child_doc: Dict[str, Any]):
+        # Write-through from the post-update projection, so the next read needs no round trip
+        cached = self.child_cache.peek(child_id) if self.child_cache is not None else None
+        if cached is None:
+            return
+        if child_doc["updated_at"] <= cached.updated_at:
+            if child_doc["updated_at"] == cached.updated_at:
+                # Written in the same millisecond (or after a later clock's write): order unknown
+                self.child_cache.invalidate(child_id)
+            # Otherwise a later answer's result was applied first and already includes this one
+            return
+        cached.streak = child_doc["streak"]
+        cached.total_stickers = child_doc.get("total_stickers", 0)
+        cached.sticker_mask = child_doc.get("sticker_mask", {})
+        cached.unique_stickers = child_doc.get("unique_stickers", 0)
+        cached.progress[grapheme] = GraphemeProgress(**child_doc["progress"][grapheme])
+        cached.updated_at = child_doc["updated_at"]
+
+    async def _collected_sticker_mask(self, child_id: str, child_doc: Dict[str, Any]) -> int:
+        if "sticker_mask" in child_doc:
+            return sticker_mask_to_int(child_doc["sticker_mask"])
+        # Child created before the bitset existed: derive it once from the sticker log and store it
+        unique_names: Set[str] = set()
+        async for s in self.stickers_collection.find({"child_id": child_id}, {"name": 1}):
+            if s.get("name"):
+                unique_names.add(s["name"])
+        mask = sticker_mask_from_names(unique_names)
         await self.children_collection.update_one(
-            {"id": child_id},
-            {"$set": child.dict()}
+            {"id": child_id, "sticker_mask": {"$exists": False}},
+            {"$set": {"sticker_mask": sticker_mask_words(mask), "unique_stickers": popcount(mask)}}
         )
+        return mask
 
-        return ProgressUpdateResponse(
-            new_streak=new_streak,
-            new_stars=new_stars,
-            sticker_earned=sticker_earned,
-            total_stickers=child.total_stickers
+    @staticmethod
+    def _new_sticker(child_id: str, sticker_id: int, streak_level: int) -> Sticker:
+        chosen = STICKER_CATALOG[sticker_id]
+        return Sticker(
+            child_id=child_id,
+            catalog_id=chosen.id,
+            name=chosen.name,
+            emoji=chosen.emoji,
+            description=chosen.desc,
+            streak_level=streak_level
         )
 
-    async def get_child_stickers(self, child_id: str) -> List[Sticker]:
-        cursor = self.stickers_collection.find({"child_id": child_id}).sort("earned_at", -1)
-        stickers_data = await cursor.to_list(length=None)
-        return [Sticker(**sticker) for sticker in stickers_data]
+    async def _award_sticker(self, child_id: str, streak_level: int, child_doc: Dict[str, Any]) -> Sticker:
+        collected_mask = await self._collected_sticker_mask(child_id, child_doc)
+        sticker_id = choose_sticker(collected_mask)
+        sticker = self._new_sticker(child_id, sticker_id, streak_level)
+        await asyncio.gather(
+            self.stickers_collection.insert_one(sticker.dict()),
+            self._mark_sticker_collected(child_id, sticker_id, collected_mask),
+        )
+        return sticker
+
+    async def _mark_sticker_collected(self, child_id: str, sticker_id: int, collected_mask: int):
+        if not collected_mask >> sticker_id & 1:
+            # Set the bit and count it as unique only if no concurrent award set it first
+            field, bit = sticker_mask_field(sticker_id)
+            result = await self.children_collection.update_one(
+                {"id": child_id, field: {"$not": {"$bitsAnySet": bit}}},
+                {"$bit": {field: {"or": bit}}, "$inc": {"total_stickers": 1, "unique_stickers": 1}}
+            )
+            if result.matched_count:
+                return
+        await self.children_collection.update_one({"id": child_id}, {"$inc": {"total_stickers": 1}})
+
+    async def _mark_stickers_collected(self, child_id: str, new_bits: int):
+        """Set several collected bits, counting as unique only those no concurrent award set first."""
+        while new_bits:
+            words = sticker_mask_words(new_bits)
+            result = await self.children_collection.update_one(
+                {"id": child_id, **{f"sticker_mask.{word}": {"$not": {"$bitsAnySet": bits}} for word, bits in words.items()}},
+                {"$bit": {f"sticker_mask.{word}": {"or": bits} for word, bits in words.items()},
+                 "$inc": {"unique_stickers": popcount(new_bits)}}
+            )
+            if result.matched_count:
+                return
+            # Some of the bits were set in the meantime: retry with the ones still clear
+            child_data = await self.children_collection.find_one({"id": child_id}, {"_id": 0, "sticker_mask": 1})
+            if child_data is None:
+                return
+            new_bits &= ~sticker_mask_to_int(child_data.get("sticker_mask"))
+
+    async def get_child_stickers(self, child_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of a child's stickers as Sticker-shaped documents, newest first, and the cursor of the next page."""
+        query = {"child_id": child_id, **keyset_filter("earned_at", after, descending=True)}
+        cursor = self.stickers_collection.find(query, model_projection(Sticker)).sort([("earned_at", -1), ("id", -1)]).limit(limit + 1)
+        stickers_data = await cursor.to_list(length=limit + 1)
+        stickers = [self.sticker_document(sticker) for sticker in stickers_data[:limit]]
+        for sticker in stickers:
+            # Stickers awarded before catalog ids existed
+            if sticker["catalog_id"] is None:
+                sticker["catalog_id"] = STICKER_IDS.get(sticker["name"])
+        next_cursor = None
+        if len(stickers_data) > limit:
+            next_cursor = encode_cursor(stickers[-1]["earned_at"], stickers[-1]["id"])
+        return stickers, next_cursor
+
+    async def count_child_stickers(self, child_id: str) -> Optional[int]:
+        # total_stickers is maintained on every award, so no count over the stickers collection
+        child_data = await self.children_collection.find_one({"id": child_id}, {"_id": 0, "total_stickers": 1})
+        return child_data.get("total_stickers", 0) if child_data else None
 
     async def update_child_settings(self, child_id: str, key: str, value) -> Optional[Child]:
         valid_keys = {
@@ -279,40 +586,9 @@ class ChildService:
                 pass
 
         update_path = f"settings.{key}"
-        result = await self.children_collection.update_one(
+        child_data = await self.children_collection.find_one_and_update(
             {"id": child_id},
-            {"$set": {update_path: value, "updated_at": datetime.utcnow()}}
+            {"$set": {update_path: value, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
         )
-        if result.modified_count > 0:
-            return await self.get_child(child_id)
-        return None
-
-    def get_grapheme_info(self) -> List[Dict[str, str]]:
-        return [
-            {
-                "grapheme": grapheme,
-                "phonetic_word": PHONEME_MAP_HU.get(grapheme, ""),
-                "audio_url": f"/api/audio/{grapheme}"
-            }
-            for grapheme in HUNGARIAN_GRAPHEMES
-        ]
-
-    def get_random_graphemes(self, count: int, include_foreign: bool = False, trouble_bias: bool = True) -> List[str]:
-        base_pool = list(HUNGARIAN_GRAPHEMES)
-        if include_foreign:
-            base_pool.extend(FOREIGN_GRAPHEMES)
-        for rare in ["dz", "dzs", "w"]:
-            if rare in base_pool and random.random() < 0.5:
-                base_pool.remove(rare)
-        max_count = min(count, len(base_pool))
-        if trouble_bias:
-            available_trouble = [g for g in base_pool if g in TROUBLE_GRAPHEMES]
-            if available_trouble and max_count > 0:
-                chosen_trouble = random.choice(available_trouble)
-                remaining_pool = [g for g in base_pool if g != chosen_trouble]
-                remaining_count = max_count - 1
-                sampled_others = random.sample(remaining_pool, remaining_count) if remaining_count > 0 else []
-                result = [chosen_trouble] + sampled_others
-                random.shuffle(result)
-                return result
-        return random.sample(base_pool, max_count)
\ No newline at end of file
+        return self._cache_child(Child(**child_data)) if child_data else None
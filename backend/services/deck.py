@@ -0,0 +1,61 @@
+from graphemes import GRAPHEME_VARIANTS, get_distractors, get_random_graphemes
+from models import (
+    ChildSettings, Deck, DeckCard, DeckRound, DifficultyLevel, GameMode, LetterCase, PHONEME_MAP_HU
+)
+from typing import NamedTuple, Tuple
+import random
+
+# find-letter grid size per difficulty (as in FindLetterGame)
+GRID_SIZES = {
+    DifficultyLevel.EASY: 6,
+    DifficultyLevel.MEDIUM: 9,
+    DifficultyLevel.HARD: 12,
+}
+
+MIXED_CASES: Tuple[LetterCase, ...] = (LetterCase.LOWERCASE, LetterCase.UPPERCASE, LetterCase.TITLECASE)
+
+
+class DeckPlan(NamedTuple):
+    """Everything a deck needs from ChildSettings."""
+    rounds: int
+    grid_size: int
+    letter_case: LetterCase
+    cases: Tuple[LetterCase, ...]
+    include_foreign: bool
+
+
+def build_deck_plan(settings: ChildSettings) -> DeckPlan:
+    letter_case = LetterCase(settings.letter_case)
+    return DeckPlan(
+        rounds=settings.letters_per_session,
+        grid_size=GRID_SIZES.get(settings.difficulty, GRID_SIZES[DifficultyLevel.MEDIUM]),
+        letter_case=letter_case,
+        cases=MIXED_CASES if letter_case == LetterCase.MIXED else (letter_case,),
+        include_foreign=settings.include_foreign_letters,
+    )
+
+
+def deal_deck(child_id: str, plan: DeckPlan, game_mode: GameMode) -> Deck:
+    """A fresh deck for one session: distinct targets, and a shuffled grid per round for find-letter."""
+    targets = get_random_graphemes(plan.rounds, plan.include_foreign, trouble_bias=True)
+    rounds = []
+    for target in targets:
+        variants = GRAPHEME_VARIANTS[target]
+        # match-case shows both forms of every target, so its rounds are lowercase
+        case = LetterCase.LOWERCASE if game_mode == GameMode.MATCH_CASE else random.choice(plan.cases)
+        choices = []
+        if game_mode == GameMode.FIND_LETTER:
+            choices = [DeckCard(grapheme=target, display=variants[case.value])] + [
+                DeckCard(grapheme=g, display=GRAPHEME_VARIANTS[g][random.choice(plan.cases).value])
+                for g in get_distractors(target, plan.grid_size - 1, plan.include_foreign)
+            ]
+            random.shuffle(choices)
+        rounds.append(DeckRound(
+            target=target,
+            display=variants[case.value],
+            case=case,
+            phonetic_word=PHONEME_MAP_HU.get(target, ""),
+            variants=variants,
+            choices=choices,
+        ))
+    return Deck(child_id=child_id, game_mode=game_mode, letter_case=plan.letter_case, rounds=rounds)
@@ -0,0 +1,70 @@
+"""Streaming export of a child's session history as NDJSON or CSV, optionally gzipped."""
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict
+import csv
+import io
+import json
+import zlib
+
+EXPORT_FIELDS = ("timestamp", "game_mode", "grapheme", "is_correct", "response_time", "id")
+# Rows encoded per chunk handed to the ASGI server
+ROWS_PER_CHUNK = 500
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv; charset=utf-8"}
+
+
+def _export_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Archived rows have no session id
+    return {
+        "timestamp": row["timestamp"].isoformat() if isinstance(row["timestamp"], datetime) else row["timestamp"],
+        "game_mode": getattr(row["game_mode"], "value", row["game_mode"]),
+        "grapheme": row["grapheme"],
+        "is_correct": row["is_correct"],
+        "response_time": row.get("response_time"),
+        "id": row.get("id"),
+    }
+
+
+async def encode_rows(rows: AsyncIterator[Dict[str, Any]], export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Encoded chunks of ROWS_PER_CHUNK rows; a CSV export starts with its header line."""
+    buffer = io.StringIO()
+    if export_format is ExportFormat.CSV:
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+        writer.writeheader()
+    pending = 0
+    async for row in rows:
+        row = _export_row(row)
+        if export_format is ExportFormat.CSV:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            buffer.write("\n")
+        pending += 1
+        if pending == ROWS_PER_CHUNK:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip a chunk stream on the fly, one compressor for the whole stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_filename(child_id: str, export_format: ExportFormat, compressed: bool) -> str:
+    return f"sessions-{child_id}.{export_format.value}" + (".gz" if compressed else "")
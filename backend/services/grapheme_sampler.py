@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from models import GraphemeProgress, HUNGARIAN_GRAPHEMES, FOREIGN_GRAPHEMES
+from services.cache import LRUCache
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import random
+
+# Floor so that mastered graphemes still come up now and then
+MIN_WEIGHT = 0.05
+# Average answer time that counts as "normal"; slower answers add weight
+REFERENCE_RESPONSE_MS = 3000
+MAX_SLOWNESS = 2.0
+
+
+def grapheme_weight(progress: Optional[GraphemeProgress]) -> float:
+    """Practice weight of one grapheme: higher for weak, rarely seen or slow ones."""
+    if progress is None:
+        progress = GraphemeProgress()
+    # Laplace-smoothed accuracy, so an unseen grapheme sits at 0.5
+    weakness = 1.0 - (progress.correct + 1) / (progress.attempts + 2)
+    novelty = 1.0 / (1 + progress.attempts)
+    slowness = 0.0
+    if progress.timed_attempts:
+        average_ms = progress.response_time_sum / progress.timed_attempts
+        slowness = min(max(average_ms / REFERENCE_RESPONSE_MS - 1.0, 0.0), MAX_SLOWNESS) / 2
+    return MIN_WEIGHT + weakness + novelty / 2 + slowness
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            small_index, large_index = small.pop(), large.pop()
+            self.prob[small_index] = scaled[small_index]
+            self.alias[small_index] = large_index
+            scaled[large_index] -= 1.0 - scaled[small_index]
+            (small if scaled[large_index] < 1.0 else large).append(large_index)
+        # Leftovers are 1.0 up to rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng: random.Random = random) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+@dataclass
+class ChildWeights:
+    graphemes: Tuple[str, ...]
+    index: Dict[str, int]
+    weights: List[float]
+    table: Optional[AliasTable] = field(default=None)
+
+    def alias_table(self) -> AliasTable:
+        # Rebuilt lazily, only after a weight changed
+        if self.table is None:
+            self.table = AliasTable(self.weights)
+        return self.table
+
+    def sample(self, count: int, rng: random.Random = random) -> List[str]:
+        """count distinct graphemes, each drawn in proportion to its weight."""
+        if count >= len(self.graphemes):
+            result = list(self.graphemes)
+            rng.shuffle(result)
+            return result
+        table = self.alias_table()
+        picked: Dict[int, None] = {}
+        # Weights are within a small constant ratio of each other, so rejecting
+        # repeats takes O(1) expected draws per grapheme
+        while len(picked) < count:
+            picked[table.draw(rng)] = None
+        return [self.graphemes[i] for i in picked]
+
+
+class AdaptiveGraphemeSampler:
+    """Per-child weighted grapheme sampler.
+
+    Weights are cached per (child, include_foreign). A progress write updates
+    the one affected weight in place and drops the alias table, which is
+    rebuilt on the next draw; rounds are drawn in O(count).
+    """
+
+    def __init__(self, cache: Optional[LRUCache] = None):
+        self.cache = cache if cache is not None else LRUCache(maxsize=10000, ttl=300)
+
+    def get(self, child_id: str, include_foreign: bool) -> Optional[ChildWeights]:
+        return self.cache.get((child_id, include_foreign))
+
+    def load(self, child_id: str, include_foreign: bool, progress: Mapping[str, GraphemeProgress]) -> ChildWeights:
+        graphemes = tuple(HUNGARIAN_GRAPHEMES + (FOREIGN_GRAPHEMES if include_foreign else []))
+        entry = ChildWeights(
+            graphemes=graphemes,
+            index={g: i for i, g in enumerate(graphemes)},
+            weights=[grapheme_weight(progress.get(g)) for g in graphemes],
+        )
+        self.cache.put((child_id, include_foreign), entry)
+        return entry
+
+    def update(self, child_id: str, grapheme: str, progress: GraphemeProgress):
+        for include_foreign in (False, True):
+            entry = self.cache.peek((child_id, include_foreign))
+            if entry is not None and grapheme in entry.index:
+                entry.weights[entry.index[grapheme]] = grapheme_weight(progress)
+                entry.table = None
+
+    def invalidate(self, child_id: str):
+        for include_foreign in (False, True):
+            self.cache.invalidate((child_id, include_foreign))
@@ -0,0 +1,88 @@
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Any, Dict, Iterable, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rollup documents maintained with $inc as sessions are logged, ones rebuilt
+# with $set by the backfill from sessions older than the live cutoff, and ones
+# rebuilt from a restored child's whole history (the backfill skips that child).
+# All kinds coexist under the same key and reports sum over them.
+SOURCE_LIVE = "live"
+SOURCE_BACKFILL = "backfill"
+SOURCE_RESTORE = "restore"
+
+ROLLUP_STATE_ID = "session_rollups"
+# Checkpoint of migrations.backfill_session_rollups; completed_at is set once it ran through
+ROLLUP_BACKFILL_STATE_ID = "session_rollups_backfill"
+
+
+def session_day(timestamp: datetime) -> datetime:
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def _rollup_key(doc: Dict[str, Any]) -> Tuple[str, datetime, str, str]:
+    game_mode = doc["game_mode"]
+    return doc["child_id"], session_day(doc["timestamp"]), doc["grapheme"], getattr(game_mode, "value", game_mode)
+
+
+def rollup_updates(session_docs: Iterable[Dict[str, Any]], source: str = SOURCE_LIVE) -> List[UpdateOne]:
+    """One $inc upsert per (child_id, day, grapheme, game_mode) touched by session_docs."""
+    groups: Dict[Tuple[str, datetime, str, str], Dict[str, Any]] = {}
+    for doc in session_docs:
+        group = groups.setdefault(_rollup_key(doc), {
+            "inc": {"attempts": 0, "correct": 0, "timed_attempts": 0, "response_time_sum": 0, "response_time_sq_sum": 0},
+            "min": None,
+            "max": None,
+        })
+        inc = group["inc"]
+        inc["attempts"] += 1
+        if doc["is_correct"]:
+            inc["correct"] += 1
+        response_time = doc.get("response_time")
+        if response_time is not None:
+            inc["timed_attempts"] += 1
+            inc["response_time_sum"] += response_time
+            inc["response_time_sq_sum"] += response_time * response_time
+            group["min"] = response_time if group["min"] is None else min(group["min"], response_time)
+            group["max"] = response_time if group["max"] is None else max(group["max"], response_time)
+
+    now = datetime.utcnow()
+    updates = []
+    for (child_id, day, grapheme, game_mode), group in groups.items():
+        update: Dict[str, Any] = {"$inc": group["inc"], "$set": {"updated_at": now}}
+        if group["min"] is not None:
+            update["$min"] = {"response_time_min": group["min"]}
+            update["$max"] = {"response_time_max": group["max"]}
+        updates.append(UpdateOne(
+            {"child_id": child_id, "day": day, "grapheme": grapheme, "game_mode": game_mode, "source": source},
+            update,
+            upsert=True,
+        ))
+    return updates
+
+
+async def apply_rollups(collection: AsyncIOMotorCollection, session_docs: List[Dict[str, Any]]):
+    """Fold newly written sessions into the rollups (one unordered bulk write)."""
+    updates = rollup_updates(session_docs)
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+
+
+async def ensure_live_cutoff(db: AsyncIOMotorDatabase) -> datetime:
+    """The moment live rollups started; the backfill covers sessions before it. Set once, on first start."""
+    await db.rollup_state.update_one(
+        {"_id": ROLLUP_STATE_ID},
+        {"$setOnInsert": {"live_since": datetime.utcnow()}},
+        upsert=True,
+    )
+    state = await db.rollup_state.find_one({"_id": ROLLUP_STATE_ID})
+    return state["live_since"]
+
+
+async def rollup_backfill_complete(db: AsyncIOMotorDatabase) -> bool:
+    """Whether sessions from before the live cutoff have all been folded into rollups."""
+    state = await db.rollup_state.find_one({"_id": ROLLUP_BACKFILL_STATE_ID}, {"completed_at": 1})
+    return bool(state and state.get("completed_at"))
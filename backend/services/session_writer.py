@@ -0,0 +1,153 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+from services.rollups import apply_rollups
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SessionWriteBuffer:
+    """Write-behind buffer for game_sessions inserts.
+
+    Session documents are not needed to answer record_game_session, so they are
+    queued in memory and written with insert_many(ordered=False) when
+    max_batch_size documents are waiting or every flush_interval seconds.
+    The queue is bounded by max_queue_size; producers wait (backpressure) while
+    it is full. Anything still queued is flushed by stop() on shutdown.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, max_batch_size: int = 500,
+                 max_queue_size: int = 10000, flush_interval: float = 1.0,
+                 rollup_collection: Optional[AsyncIOMotorCollection] = None):
+        self.collection = collection
+        # Daily rollups are folded in per flushed batch, after the sessions are stored
+        self.rollup_collection = rollup_collection
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Metrics
+        self.max_depth = 0
+        self.flushes = 0
+        self.flushed_docs = 0
+        self.failed_docs = 0
+        self.failed_rollup_docs = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Signalled rather than cancelled, so an in-flight insert_many is never interrupted
+        if self._task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def put_many(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            while len(self._buffer) >= self.max_queue_size:
+                self.backpressure_waits += 1
+                self._space_available.clear()
+                self._flush_requested.set()
+                await self._space_available.wait()
+            self._buffer.append(doc)
+        self.max_depth = max(self.max_depth, len(self._buffer))
+        if len(self._buffer) >= self.max_batch_size:
+            self._flush_requested.set()
+
+    async def put(self, doc: Dict[str, Any]):
+        await self.put_many([doc])
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Keep the loop alive; the batch was requeued and is retried on the next tick
+                logger.error(f"Session buffer flush failed: {e}")
+
+    async def flush(self):
+        """Write everything queued so far, in batches of max_batch_size."""
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.max_batch_size]
+                del self._buffer[:self.max_batch_size]
+                started = time.perf_counter()
+                stored = batch
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                    self.flushed_docs += len(batch)
+                except BulkWriteError as e:
+                    # Partial success: everything except the reported errors was written.
+                    # Duplicate keys are documents already written by an earlier, retried attempt
+                    # (which failed before its rollups), so they still count as stored.
+                    errors = e.details.get("writeErrors", [])
+                    self.flushed_docs += len(batch) - len(errors)
+                    failed = {err["index"] for err in errors if err.get("code") != 11000}
+                    self.failed_docs += len(failed)
+                    stored = [doc for i, doc in enumerate(batch) if i not in failed]
+                except Exception:
+                    # Requeue in front (documents keep their client-side _id, so a retry cannot duplicate)
+                    self._buffer[:0] = batch
+                    raise
+                finally:
+                    self._record_flush((time.perf_counter() - started) * 1000)
+                    self._space_available.set()
+                await self._apply_rollups(stored)
+
+    async def _apply_rollups(self, docs: List[Dict[str, Any]]):
+        if self.rollup_collection is None or not docs:
+            return
+        try:
+            await apply_rollups(self.rollup_collection, docs)
+        except Exception as e:
+            # Sessions are stored; only the rollups drift, and the backfill can rebuild them
+            self.failed_rollup_docs += len(docs)
+            logger.error(f"Rollup update failed for {len(docs)} sessions: {e}")
+
+    def _record_flush(self, elapsed_ms: float):
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "max_queue_size": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "flush_interval": self.flush_interval,
+            "flushes": self.flushes,
+            "flushed_docs": self.flushed_docs,
+            "failed_docs": self.failed_docs,
+            "failed_rollup_docs": self.failed_rollup_docs,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
@@ -0,0 +1,269 @@
+"""Family snapshots: selected children with everything stored under them, as gzipped NDJSON.
+
+The first line is a header listing the snapshot's child ids; every following
+line is {"c": <collection>, "d": <document>} in MongoDB relaxed extended JSON
+(datetimes and binary archive blocks round-trip). _id is not kept.
+
+Rollups are not part of a snapshot: a restore rebuilds them from the restored
+sessions and archive blocks (older snapshots that carry them are still read,
+their rollup lines are skipped).
+"""
+from bson import json_util
+from contextlib import asynccontextmanager
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from services.archive import session_history
+from services.rollups import SOURCE_RESTORE, rollup_updates
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import gzip
+import logging
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+# Collection -> field holding the child id
+CHILD_COLLECTIONS: Dict[str, str] = {
+    "children": "id",
+    "game_sessions": "child_id",
+    "stickers": "child_id",
+    "session_rollups": "child_id",
+    "session_archive": "child_id",
+}
+# What a snapshot carries: everything but the rollups, which are derived
+SNAPSHOT_COLLECTIONS: Dict[str, str] = {c: f for c, f in CHILD_COLLECTIONS.items() if c != "session_rollups"}
+_JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+class SnapshotRestoreError(Exception):
+    """A restore stopped after it began deleting or writing child_ids: they may be partly restored."""
+
+    def __init__(self, message: str, child_ids: List[str]):
+        super().__init__(message)
+        self.child_ids = child_ids
+
+
+def _line(document: Dict[str, Any]) -> bytes:
+    return json_util.dumps(document, json_options=_JSON_OPTIONS, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+async def _supports_snapshot_reads(db: AsyncIOMotorDatabase) -> bool:
+    # Snapshot reads (one point in time across collections) need a replica set
+    hello = await db.client.admin.command("hello")
+    if "setName" not in hello:
+        logger.warning("Not a replica set: snapshot reads unavailable, children are read as they are")
+        return False
+    return True
+
+
+@asynccontextmanager
+async def _child_session(db: AsyncIOMotorDatabase, snapshot: bool) -> AsyncIterator[Optional[AsyncIOMotorClientSession]]:
+    if not snapshot:
+        yield None
+        return
+    async with await db.client.start_session(snapshot=True) as session:
+        yield session
+
+
+async def _child_lines(db: AsyncIOMotorDatabase, child_id: str, snapshot: bool,
+                       batch_size: int) -> AsyncIterator[bytes]:
+    # Sent as the cursors deliver: at most one batch of the child is in memory
+    async with _child_session(db, snapshot) as session:
+        for collection, field in SNAPSHOT_COLLECTIONS.items():
+            cursor = db[collection].find({field: child_id}, {"_id": 0}, session=session).batch_size(batch_size)
+            async for document in cursor:
+                yield _line({"c": collection, "d": document})
+
+
+async def snapshot_lines(db: AsyncIOMotorDatabase, child_ids: Optional[List[str]] = None,
+                         batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """The snapshot of child_ids (every child when None) as uncompressed NDJSON lines.
+
+    Consistency is per child: each child is read in its own snapshot session
+    (on a replica set), streamed cursor batch by cursor batch, so a big family
+    does not have to fit in the server's snapshot history window
+    (minSnapshotHistoryWindowInSeconds, 300 s by default); one child has to be
+    sent within it. Different children may be read at different points in time.
+    """
+    snapshot = await _supports_snapshot_reads(db)
+    if child_ids is None:
+        cursor = db.children.find({}, {"_id": 0, "id": 1}).sort("id", 1)
+        child_ids = [child["id"] async for child in cursor]
+    else:
+        found = db.children.find({"id": {"$in": child_ids}}, {"_id": 0, "id": 1})
+        child_ids = sorted({child["id"] async for child in found})
+    yield _line({
+        "snapshot": SNAPSHOT_FORMAT,
+        "created_at": datetime.utcnow(),
+        "child_ids": child_ids,
+        "collections": list(SNAPSHOT_COLLECTIONS),
+    })
+    for child_id in child_ids:
+        async for line in _child_lines(db, child_id, snapshot, batch_size):
+            yield line
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes], compressed: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Parse a (gzipped) snapshot stream arriving in arbitrary chunks, one record at a time."""
+    decompressor = zlib.decompressobj(47) if compressed else None  # 47: gzip or zlib header
+    pending = b""
+    async for chunk in chunks:
+        try:
+            pending += decompressor.decompress(chunk) if decompressor else chunk
+        except zlib.error as e:
+            raise ValueError(f"Not a gzipped snapshot: {e}")
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json_util.loads(line, json_options=_JSON_OPTIONS)
+    if decompressor:
+        pending += decompressor.flush()
+    if pending.strip():
+        yield json_util.loads(pending, json_options=_JSON_OPTIONS)
+
+
+async def delete_children_data(db: AsyncIOMotorDatabase, child_ids: List[str]) -> None:
+    await asyncio.gather(*(
+        db[collection].delete_many({field: {"$in": child_ids}}) for collection, field in CHILD_COLLECTIONS.items()
+    ))
+
+
+async def _rebuild_child_rollups(db: AsyncIOMotorDatabase, child_id: str, batch_size: int) -> None:
+    # The child's rollups were deleted (or never existed): $inc from zero, batch after batch
+    batch: List[Dict[str, Any]] = []
+    async for session in session_history(db, child_id):
+        batch.append(session)
+        if len(batch) >= batch_size:
+            await db.session_rollups.bulk_write(rollup_updates(batch, SOURCE_RESTORE), ordered=False)
+            batch = []
+    if batch:
+        await db.session_rollups.bulk_write(rollup_updates(batch, SOURCE_RESTORE), ordered=False)
+
+
+async def restore_snapshot(db: AsyncIOMotorDatabase, records: AsyncIterator[Dict[str, Any]], replace: bool = False,
+                           batch_size: int = 1000, concurrency: int = 8) -> Dict[str, Any]:
+    """Load a snapshot with unordered insert_many batches, up to concurrency in flight.
+
+    Children already present are an error unless replace is set, in which
+    case everything stored under them is deleted first. The children's rollups
+    are then rebuilt from what was restored, tagged so the rollup backfill
+    leaves them alone. Returns rows written per collection (rollups: documents
+    rebuilt), the elapsed time and the rows/second achieved. A batch
+    that fails (in part) is counted in failed_batches, with its first error
+    in error; the other batches still run. Anything that stops the restore
+    once it has started changing the children (a bad record, a lost
+    connection) is raised as SnapshotRestoreError, which carries their ids.
+    """
+    started = time.perf_counter()
+    header = await anext(records, {})
+    if header.get("snapshot") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Not a snapshot (format {header.get('snapshot')!r})")
+    child_ids: List[str] = header["child_ids"]
+    existing = [c["id"] async for c in db.children.find({"id": {"$in": child_ids}}, {"_id": 0, "id": 1})]
+    if existing and not replace:
+        raise ValueError(f"{len(existing)} children already exist (first: {existing[0]}); restore with replace")
+    try:
+        written, failures = await _restore_children(db, records, child_ids, existing, batch_size, concurrency)
+    except Exception as e:
+        raise SnapshotRestoreError(f"Restore stopped, children may be partly restored: {e}", child_ids) from e
+
+    elapsed = time.perf_counter() - started
+    rows = sum(written.values())
+    report = {
+        "child_ids": child_ids,
+        "replaced": len(existing),
+        "written": written,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed) if elapsed else rows,
+        "failed_batches": len(failures),
+        "error": str(failures[0]) if failures else None,
+    }
+    if failures:
+        logger.error(f"Snapshot restore: {len(failures)} batches partly failed, first: {failures[0]}")
+    logger.info(f"Restored {rows} rows for {len(child_ids)} children in {elapsed:.1f}s ({report['rows_per_second']} rows/s)")
+    return report
+
+
+async def _restore_children(db: AsyncIOMotorDatabase, records: AsyncIterator[Dict[str, Any]], child_ids: List[str],
+                            existing: List[str], batch_size: int,
+                            concurrency: int) -> Tuple[Dict[str, int], List[BaseException]]:
+    if existing:
+        await delete_children_data(db, existing)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: Set[asyncio.Task] = set()
+    written = {collection: 0 for collection in SNAPSHOT_COLLECTIONS}
+    failures: List[BaseException] = []
+
+    async def insert(collection: str, documents: List[Dict[str, Any]]):
+        try:
+            result = await db[collection].insert_many(documents, ordered=False)
+            written[collection] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            written[collection] += e.details.get("nInserted", 0)
+            failures.append(e)
+        except Exception as e:
+            # AutoReconnect, timeouts, ...: nothing of the batch is known to be written
+            failures.append(e)
+        finally:
+            semaphore.release()
+
+    async def submit(collection: str, documents: List[Dict[str, Any]]):
+        # Waiting for a free slot before reading on keeps memory at concurrency batches
+        await semaphore.acquire()
+        task = asyncio.create_task(insert(collection, documents))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    batches: Dict[str, List[Dict[str, Any]]] = {collection: [] for collection in SNAPSHOT_COLLECTIONS}
+    allowed = set(child_ids)
+    try:
+        async for record in records:
+            collection, document = record["c"], record["d"]
+            if collection not in CHILD_COLLECTIONS or document.get(CHILD_COLLECTIONS[collection]) not in allowed:
+                raise ValueError(f"Unexpected snapshot record for {collection}")
+            if collection not in SNAPSHOT_COLLECTIONS:
+                continue
+            batch = batches[collection]
+            batch.append(document)
+            if len(batch) >= batch_size:
+                await submit(collection, batch)
+                batches[collection] = []
+        for collection, batch in batches.items():
+            if batch:
+                await submit(collection, batch)
+    finally:
+        # Also on a bad record: let the batches already sent finish before reporting it
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def rebuild(child_id: str):
+        async with semaphore:
+            await _rebuild_child_rollups(db, child_id, batch_size)
+
+    await asyncio.gather(*(rebuild(child_id) for child_id in child_ids))
+    written["session_rollups"] = await db.session_rollups.count_documents({"child_id": {"$in": child_ids}})
+    return written, failures
+
+
+async def write_snapshot_file(db: AsyncIOMotorDatabase, path: str, child_ids: Optional[List[str]] = None) -> int:
+    """Write a gzipped snapshot to path; returns the number of documents in it."""
+    documents = -1  # the header line is not a document
+    with gzip.open(path, "wb") as out:
+        async for line in snapshot_lines(db, child_ids):
+            out.write(line)
+            documents += 1
+    return documents
+
+
+async def restore_snapshot_file(db: AsyncIOMotorDatabase, path: str, **kwargs) -> Dict[str, Any]:
+    async def chunks() -> AsyncIterator[bytes]:
+        with open(path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                yield chunk
+
+    return await restore_snapshot(db, ndjson_records(chunks()), **kwargs)
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from models import ChildStats, DailyStats, GameModeStats, GraphemeStats, ResponseTimeStats
+from typing import Any, Dict, List
+import math
+
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 365
+TREND_DAYS = 7
+
+
+def _sums(*fields: str) -> Dict[str, Any]:
+    return {field: {"$sum": f"${field}"} for field in fields}
+
+
+def _accuracy(correct: int, attempts: int) -> float:
+    return round(correct / attempts, 4) if attempts else 0.0
+
+
+def child_stats_pipeline(child_id: str, since: datetime, today: datetime) -> List[Dict[str, Any]]:
+    """One aggregation over a child's daily rollups from the since day on.
+
+    Reads only session_rollups (at most one document per day, grapheme and
+    game mode), through the child_id_day_key index; game_sessions is not touched.
+    """
+    trend_since = max(since, today - timedelta(days=2 * TREND_DAYS - 1))
+    return [
+        {"$match": {"child_id": child_id, "day": {"$gte": since}}},
+        {"$facet": {
+            "total": [{"$group": {
+                "_id": None,
+                **_sums("attempts", "correct", "timed_attempts", "response_time_sum", "response_time_sq_sum"),
+                "response_time_min": {"$min": "$response_time_min"},
+                "response_time_max": {"$max": "$response_time_max"},
+            }}],
+            "by_grapheme": [
+                {"$group": {"_id": "$grapheme", **_sums("attempts", "correct", "timed_attempts", "response_time_sum")}},
+                {"$sort": {"_id": 1}},
+            ],
+            "by_mode": [
+                {"$group": {"_id": "$game_mode", **_sums("attempts", "correct")}},
+                {"$sort": {"_id": 1}},
+            ],
+            "daily": [
+                {"$group": {"_id": "$day", **_sums("attempts", "correct")}},
+                {"$sort": {"_id": 1}},
+            ],
+            "trend": [
+                {"$match": {"day": {"$gte": trend_since}}},
+                {"$group": {"_id": {"$gt": ["$day", today - timedelta(days=TREND_DAYS)]}, **_sums("attempts", "correct")}},
+            ],
+        }},
+    ]
+
+
+def _response_time_stats(total: Dict[str, Any]) -> ResponseTimeStats:
+    count = total.get("timed_attempts", 0)
+    if not count:
+        return ResponseTimeStats()
+    mean = total["response_time_sum"] / count
+    variance = max(total["response_time_sq_sum"] / count - mean * mean, 0.0)
+    return ResponseTimeStats(
+        count=count,
+        mean=round(mean, 1),
+        stddev=round(math.sqrt(variance), 1),
+        min=total.get("response_time_min"),
+        max=total.get("response_time_max"),
+    )
+
+
+def child_stats_from_facets(child_id: str, days: int, since: datetime, facets: Dict[str, List[Dict[str, Any]]]) -> ChildStats:
+    total = facets["total"][0] if facets["total"] else {"attempts": 0, "correct": 0}
+    trend_groups = {group["_id"]: group for group in facets["trend"]}
+    trend = None
+    if True in trend_groups and False in trend_groups:
+        recent, previous = trend_groups[True], trend_groups[False]
+        trend = round(
+            _accuracy(recent["correct"], recent["attempts"]) - _accuracy(previous["correct"], previous["attempts"]), 4
+        )
+    return ChildStats(
+        child_id=child_id,
+        days=days,
+        since=since,
+        attempts=total["attempts"],
+        correct=total["correct"],
+        accuracy=_accuracy(total["correct"], total["attempts"]),
+        by_grapheme=[
+            GraphemeStats(
+                grapheme=g["_id"],
+                attempts=g["attempts"],
+                correct=g["correct"],
+                accuracy=_accuracy(g["correct"], g["attempts"]),
+                mean_response_time=round(g["response_time_sum"] / g["timed_attempts"], 1) if g["timed_attempts"] else None,
+            )
+            for g in facets["by_grapheme"]
+        ],
+        by_mode=[
+            GameModeStats(
+                game_mode=m["_id"],
+                attempts=m["attempts"],
+                correct=m["correct"],
+                accuracy=_accuracy(m["correct"], m["attempts"]),
+            )
+            for m in facets["by_mode"]
+        ],
+        response_time=_response_time_stats(total),
+        daily=[
+            DailyStats(
+                date=d["_id"].strftime("%Y-%m-%d"),
+                attempts=d["attempts"],
+                correct=d["correct"],
+                accuracy=_accuracy(d["correct"], d["attempts"]),
+            )
+            for d in facets["daily"]
+        ],
+        trend=trend,
+    )
@@ -0,0 +1,219 @@
+"""Immutable, indexed sticker catalog.
+
+A sticker's id is its position in _CATALOG_SOURCE and is persisted (Child.sticker_mask,
+Sticker.catalog_id), so new stickers must only ever be appended at the end.
+"""
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+import hashlib
+import json
+import random
+
+# 102 egyedi magyar nevű és rövid leírású matrica katalógus
+_CATALOG_SOURCE: List[Dict[str, str]] = [
+    # Állat Hős (10)
+    {"name": "Állat Hős - Róka", "emoji": "🦊", "desc": "Ravasz és fürge tanuló!"},
+    {"name": "Állat Hős - Medve", "emoji": "🐻", "desc": "Erős kitartás, szuper haladás."},
+    {"name": "Állat Hős - Bagoly", "emoji": "🦉", "desc": "Bölcsen gyakorolsz minden nap."},
+    {"name": "Állat Hős - Delfin", "emoji": "🐬", "desc": "Gyors és okos, ügyes felismerés!"},
+    {"name": "Állat Hős - Nyuszi", "emoji": "🐰", "desc": "Ugrásszerű fejlődés!"},
+    {"name": "Állat Hős - Teknős", "emoji": "🐢", "desc": "Lassan, de biztosan haladsz."},
+    {"name": "Állat Hős - Páva", "emoji": "🦚", "desc": "Színes és ragyogó teljesítmény."},
+    {"name": "Állat Hős - Oroszlán", "emoji": "🦁", "desc": "Bátor és hangos siker!"},
+    {"name": "Állat Hős - Panda", "emoji": "🐼", "desc": "Kedves és kitartó próbálkozás."},
+    {"name": "Állat Hős - Mókus", "emoji": "🐿️", "desc": "Gyorsan gyűjtöd a tudást."},
+    # Jármű Mester (10)
+    {"name": "Jármű Mester - Autó", "emoji": "🚗", "desc": "Száguld a fejlődés!"},
+    {"name": "Jármű Mester - Vonat", "emoji": "🚆", "desc": "Folyamatos haladás, mint a vonat."},
+    {"name": "Jármű Mester - Repülő", "emoji": "✈️", "desc": "Magasba emelkedő eredmények."},
+    {"name": "Jármű Mester - Hajó", "emoji": "🛳️", "desc": "Stabil haladás a betűk tengerén."},
+    {"name": "Jármű Mester - Tűzoltó", "emoji": "🚒", "desc": "Tűzoltó gyorsaságával javítasz!"},
+    {"name": "Jármű Mester - Mentő", "emoji": "🚑", "desc": "Segítsz magadnak jobban olvasni."},
+    {"name": "Jármű Mester - Busz", "emoji": "🚌", "desc": "Sok állomáson át vezet az utad."},
+    {"name": "Jármű Mester - Traktor", "emoji": "🚜", "desc": "Erősen húzod a tanulást előre."},
+    {"name": "Jármű Mester - Versenyautó", "emoji": "🏎️", "desc": "Villámgyors felismerések!"},
+    {"name": "Jármű Mester - Helikopter", "emoji": "🚁", "desc": "Felülről is átlátod a betűket."},
+    # Természet Felfedező (10)
+    {"name": "Természet Felfedező - Fa", "emoji": "🌳", "desc": "Erős alap, egyre magasabb ágak."},
+    {"name": "Természet Felfedező - Virág", "emoji": "🌸", "desc": "Kinyílik a tudásod."},
+    {"name": "Természet Felfedező - Hegy", "emoji": "⛰️", "desc": "Csúcsra törő teljesítmény."},
+    {"name": "Természet Felfedező - Nap", "emoji": "☀️", "desc": "Ragyogó eredmények nap mint nap."},
+    {"name": "Természet Felfedező - Hold", "emoji": "🌙", "desc": "Csendes, de biztos haladás."},
+    {"name": "Természet Felfedező - Csillag", "emoji": "⭐", "desc": "Csillogó sikerek sorozata."},
+    {"name": "Természet Felfedező - Felhő", "emoji": "☁️", "desc": "Könnyed tanulás, mint a pelyhek."},
+    {"name": "Természet Felfedező - Szivárvány", "emoji": "🌈", "desc": "Színes és örömteli fejlődés."},
+    {"name": "Természet Felfedező - Tenger", "emoji": "🌊", "desc": "Mély és gazdag tudás hullámzik."},
+    {"name": "Természet Felfedező - Tűz", "emoji": "🔥", "desc": "Lángoló lelkesedés a betűkért."},
+    # Sport Bajnok (10)
+    {"name": "Sport Bajnok - Foci", "emoji": "⚽", "desc": "Gólt rúgsz minden jó válasszal!"},
+    {"name": "Sport Bajnok - Kosár", "emoji": "🏀", "desc": "Hárompontos teljesítmény!"},
+    {"name": "Sport Bajnok - Tenisz", "emoji": "🎾", "desc": "Ütős felismerések!"},
+    {"name": "Sport Bajnok - Úszás", "emoji": "🏊", "desc": "Úszol a sikerben!"},
+    {"name": "Sport Bajnok - Futás", "emoji": "🏃", "desc": "Gyors tempóban haladsz előre."},
+    {"name": "Sport Bajnok - Bicikli", "emoji": "🚴", "desc": "Kiegyensúlyozott fejlődés."},
+    {"name": "Sport Bajnok - Torna", "emoji": "🤸", "desc": "Hajlékony gondolkodás, remek forma."},
+    {"name": "Sport Bajnok - Jéghoki", "emoji": "🏒", "desc": "Jéghideg koncentráció, pontos találat."},
+    {"name": "Sport Bajnok - Sí", "emoji": "⛷️", "desc": "Lejtmenetben is stabil a tudás."},
+    {"name": "Sport Bajnok - Judo", "emoji": "🥋", "desc": "Fegyelem és erő a tanulásban."},
+    # Űr Utazó (10)
+    {"name": "Űr Utazó - Rakéta", "emoji": "🚀", "desc": "Kilősz a tudás világába!"},
+    {"name": "Űr Utazó - Bolygó", "emoji": "🪐", "desc": "Új betűvilágokat fedezel fel."},
+    {"name": "Űr Utazó - Csillag", "emoji": "🌟", "desc": "Ragyogó teljesítmény az égen."},
+    {"name": "Űr Utazó - Űrhajós", "emoji": "👩‍🚀", "desc": "Bátor felfedező vagy!"},
+    {"name": "Űr Utazó - Távcső", "emoji": "🔭", "desc": "Éles szemmel figyelsz a részletekre."},
+    {"name": "Űr Utazó - Meteorit", "emoji": "☄️", "desc": "Száguldó siker!"},
+    {"name": "Űr Utazó - Holdbázis", "emoji": "🏚️", "desc": "Biztos bázis a tudásnak."},
+    {"name": "Űr Utazó - Galaxis", "emoji": "🌌", "desc": "Táguló tudáshorizont."},
+    {"name": "Űr Utazó - Rover", "emoji": "🤖", "desc": "Kitartóan kutatsz és tanulsz."},
+    {"name": "Űr Utazó - Antenna", "emoji": "📡", "desc": "Jeleket fogsz – megérted a betűket."},
+    # Zenei Csillag (10)
+    {"name": "Zenei Csillag - Hegedű", "emoji": "🎻", "desc": "Harmonikus fejlődés."},
+    {"name": "Zenei Csillag - Zongora", "emoji": "🎹", "desc": "Pontosan játszol a betűkkel."},
+    {"name": "Zenei Csillag - Gitár", "emoji": "🎸", "desc": "Pengeted a tudás húrjait."},
+    {"name": "Zenei Csillag - Dob", "emoji": "🥁", "desc": "Jó ritmusban haladsz."},
+    {"name": "Zenei Csillag - Fuvola", "emoji": "🎶", "desc": "Könnyed és tiszta megoldások."},
+    {"name": "Zenei Csillag - Mikrofon", "emoji": "🎤", "desc": "Hangosan kimondod a helyeset."},
+    {"name": "Zenei Csillag - Hangjegy", "emoji": "🎵", "desc": "Minden válaszod zenél."},
+    {"name": "Zenei Csillag - Szaxofon", "emoji": "🎷", "desc": "Egyedi hangon szól a tudás."},
+    {"name": "Zenei Csillag - Trombita", "emoji": "🎺", "desc": "Fényes sikerfanfár!"},
+    {"name": "Zenei Csillag - Dj Pult", "emoji": "🎧", "desc": "Te kevered a tudást profin."},
+    # Iskolai Hős (10)
+    {"name": "Iskolai Hős - Könyv", "emoji": "📚", "desc": "A könyvek barátja vagy."},
+    {"name": "Iskolai Hős - Ceruza", "emoji": "✏️", "desc": "Pontosan írsz és rajzolsz."},
+    {"name": "Iskolai Hős - Radír", "emoji": "🧽", "desc": "Hibátlanítás mestere."},
+    {"name": "Iskolai Hős - Táska", "emoji": "🎒", "desc": "Mindig felkészült vagy."},
+    {"name": "Iskolai Hős - Számológép", "emoji": "🧮", "desc": "Okos számolás, okos észrevétel."},
+    {"name": "Iskolai Hős - Ecset", "emoji": "🖌️", "desc": "Szép és pontos vonalak."},
+    {"name": "Iskolai Hős - Vonalzó", "emoji": "📏", "desc": "Rendszerető és precíz."},
+    {"name": "Iskolai Hős - Földgömb", "emoji": "🌍", "desc": "Világlátó tudás."},
+    {"name": "Iskolai Hős - Óra", "emoji": "⏰", "desc": "Jó tempóban tanulsz."},
+    {"name": "Iskolai Hős - Diploma", "emoji": "🎓", "desc": "Igazi kis tudós!"},
+    # Étel Rajongó (10)
+    {"name": "Étel Rajongó - Alma", "emoji": "🍎", "desc": "Egészséges tudással tele."},
+    {"name": "Étel Rajongó - Banán", "emoji": "🍌", "desc": "Energiával teli tanulás."},
+    {"name": "Étel Rajongó - Szőlő", "emoji": "🍇", "desc": "Apró lépésekkel nagy eredmény."},
+    {"name": "Étel Rajongó - Eper", "emoji": "🍓", "desc": "Édes siker!"},
+    {"name": "Étel Rajongó - Dinnye", "emoji": "🍉", "desc": "Nagy falatokban haladsz."},
+    {"name": "Étel Rajongó - Sajt", "emoji": "🧀", "desc": "Okos mint egy kisegér."},
+    {"name": "Étel Rajongó - Pizza", "emoji": "🍕", "desc": "Minden szeletben tudás van."},
+    {"name": "Étel Rajongó - Szendvics", "emoji": "🥪", "desc": "Rétegenként épül a tudás."},
+    {"name": "Étel Rajongó - Leves", "emoji": "🍲", "desc": "Melengető, tápláló fejlődés."},
+    {"name": "Étel Rajongó - Süti", "emoji": "🍪", "desc": "Jutalomfalat a jó válaszokért."},
+    # Formák Mágusa (10)
+    {"name": "Formák Mágusa - Kör", "emoji": "⚪", "desc": "Kerek a tudásod!"},
+    {"name": "Formák Mágusa - Négyzet", "emoji": "🟥", "desc": "Stabil és szilárd alapok."},
+    {"name": "Formák Mágusa - Háromszög", "emoji": "🔺", "desc": "Háromszor is meggondolt válaszok."},
+    {"name": "Formák Mágusa - Csillag", "emoji": "⭐", "desc": "Csillagfényű felismerések."},
+    {"name": "Formák Mágusa - Szív", "emoji": "❤️", "desc": "Szívvel-lélekkel tanulsz."},
+    {"name": "Formák Mágusa - Gyémánt", "emoji": "💎", "desc": "Csiszolt tudás, fényes siker."},
+    {"name": "Formák Mágusa - Nyíl", "emoji": "➡️", "desc": "Mindig jó irányba haladsz."},
+    {"name": "Formák Mágusa - Spirál", "emoji": "🌀", "desc": "Felfelé ívelő tudás."},
+    {"name": "Formák Mágusa - Puzzle", "emoji": "🧩", "desc": "Összeáll a nagy kép."},
+    {"name": "Formák Mágusa - Csepp", "emoji": "💧", "desc": "Apránként töltődik a tudás."},
+    # Extra Állatok (12)
+    {"name": "Állat Hős - Zsiráf", "emoji": "🦒", "desc": "Magasra nyújtózó célok."},
+    {"name": "Állat Hős - Pingvin", "emoji": "🐧", "desc": "Elegáns és kitartó lépések."},
+    {"name": "Állat Hős - Bálna", "emoji": "🐋", "desc": "Óriási tudás hullámzik benned."},
+    {"name": "Állat Hős - Ló", "emoji": "🐴", "desc": "Fürge és erős haladás."},
+    {"name": "Állat Hős - Egér", "emoji": "🐭", "desc": "Apró, de bátor lépések."},
+    {"name": "Állat Hős - Koala", "emoji": "🐨", "desc": "Nyugodt, biztos fejlődés."},
+    {"name": "Állat Hős - Farkas", "emoji": "🐺", "desc": "Okos csapatjátékos a betűk között."},
+    {"name": "Állat Hős - Víziló", "emoji": "🦛", "desc": "Súlyos érvekkel nyersz."},
+    {"name": "Állat Hős - Pulyka", "emoji": "🦃", "desc": "Hangosan ünnepled a sikert."},
+    {"name": "Állat Hős - Polip", "emoji": "🐙", "desc": "Sokoldalúan kezeled a feladatokat."},
+    {"name": "Állat Hős - Kenguru", "emoji": "🦘", "desc": "Nagy ugrások a tudásban."},
+    {"name": "Állat Hős - Csiga", "emoji": "🐌", "desc": "Lassú, de kitartó haladás."},
+]
+
+
+class CatalogSticker(NamedTuple):
+    id: int
+    name: str
+    emoji: str
+    desc: str
+    category: str
+
+
+STICKER_CATALOG: Tuple[CatalogSticker, ...] = tuple(
+    CatalogSticker(id=i, name=item["name"], emoji=item["emoji"], desc=item["desc"], category=item["name"].split(" - ")[0])
+    for i, item in enumerate(_CATALOG_SOURCE)
+)
+STICKER_IDS: Mapping[str, int] = MappingProxyType({s.name: s.id for s in STICKER_CATALOG})
+STICKER_CATEGORIES: Mapping[str, Tuple[int, ...]] = MappingProxyType({
+    category: tuple(s.id for s in STICKER_CATALOG if s.category == category)
+    for category in dict.fromkeys(s.category for s in STICKER_CATALOG)
+})
+FULL_MASK = (1 << len(STICKER_CATALOG)) - 1
+
+CATALOG_PAYLOAD = {
+    "stickers": [s._asdict() for s in STICKER_CATALOG],
+    "categories": {category: list(ids) for category, ids in STICKER_CATEGORIES.items()},
+}
+CATALOG_VERSION = hashlib.sha256(
+    json.dumps(CATALOG_PAYLOAD, ensure_ascii=False, sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+CATALOG_PAYLOAD["version"] = CATALOG_VERSION
+
+# Collected stickers are stored on the child as a bitset over catalog ids,
+# split into 32-bit words keyed by word index: {"0": bits 0-31, "1": bits 32-63, ...}
+STICKER_MASK_WORD_BITS = 32
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def sticker_mask_to_int(words: Optional[Dict[str, int]]) -> int:
+    mask = 0
+    for word, bits in (words or {}).items():
+        mask |= int(bits) << (int(word) * STICKER_MASK_WORD_BITS)
+    return mask
+
+
+def sticker_mask_words(mask: int) -> Dict[str, int]:
+    words = {}
+    word = 0
+    while mask:
+        bits = mask & ((1 << STICKER_MASK_WORD_BITS) - 1)
+        if bits:
+            words[str(word)] = bits
+        mask >>= STICKER_MASK_WORD_BITS
+        word += 1
+    return words
+
+
+def sticker_mask_field(sticker_id: int) -> Tuple[str, int]:
+    # Mongo field path and bit value for a catalog id, for $bit / $bitsAnySet
+    word, bit = divmod(sticker_id, STICKER_MASK_WORD_BITS)
+    return f"sticker_mask.{word}", 1 << bit
+
+
+def sticker_mask_from_names(names: Set[str]) -> int:
+    mask = 0
+    for name in names:
+        if name in STICKER_IDS:
+            mask |= 1 << STICKER_IDS[name]
+    return mask
+
+
+def nth_set_bit(mask: int, n: int) -> int:
+    """Position of the n-th (0-based) set bit, by binary search over prefix popcounts."""
+    lo, hi = 0, mask.bit_length()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if popcount(mask & ((2 << mid) - 1)) > n:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def sample_collected(mask: int, rng=random) -> Optional[int]:
+    """Uniformly random collected sticker id, without materializing the collected list."""
+    mask &= FULL_MASK
+    count = popcount(mask)
+    return nth_set_bit(mask, rng.randrange(count)) if count else None
+
+
+def sample_uncollected(mask: int, rng=random) -> Optional[int]:
+    return sample_collected(~mask & FULL_MASK, rng)
@@ -6,10 +6,21 @@ const API = `${BACKEND_URL}/api`;
 // API service for Betűkereső app
 class ApiService {
   // Children endpoints
+  // Follows X-Next-Cursor until the last page of a paginated list endpoint
+  static async getAllPages(url, params = {}) {
+    const items = [];
+    let after;
+    do {
+      const response = await axios.get(url, { params: { ...params, after } });
+      items.push(...response.data);
+      after = response.headers['x-next-cursor'];
+    } while (after);
+    return items;
+  }
+
   static async getChildren() {
     try {
-      const response = await axios.get(`${API}/children/`);
-      return response.data;
+      return await ApiService.getAllPages(`${API}/children/`);
     } catch (error) {
       console.error('Error fetching children:', error);
       throw error;
@@ -67,16 +78,51 @@ class ApiService {
     }
   }
 
-  static async getChildStickers(childId) {
+  static async recordProgressBatch(childId, sessions) {
     try {
-      const response = await axios.get(`${API}/children/${childId}/stickers`);
+      const response = await axios.post(`${API}/children/${childId}/progress/batch`, sessions);
       return response.data;
+    } catch (error) {
+      console.error('Error recording progress batch:', error);
+      throw error;
+    }
+  }
+
+  static async getChildStickers(childId) {
+    try {
+      return await ApiService.getAllPages(`${API}/children/${childId}/stickers`);
     } catch (error) {
       console.error('Error fetching stickers:', error);
       throw error;
     }
   }
 
+  static async getStickerCatalog() {
+    try {
+      const response = await axios.get(`${API}/stickers/catalog`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching sticker catalog:', error);
+      throw error;
+    }
+  }
+
+  static async getChildStats(childId, days = 30) {
+    try {
+      const response = await axios.get(`${API}/children/${childId}/stats`, { params: { days } });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching child stats:', error);
+      throw error;
+    }
+  }
+
+  // Download link for the child's full answer log (streamed by the backend)
+  static getSessionsExportUrl(childId, format = 'csv', gzip = false) {
+    const params = new URLSearchParams({ format, gzip: String(gzip) });
+    return `${API}/children/${childId}/sessions/export?${params}`;
+  }
+
   // Settings endpoints
   static async updateSetting(childId, key, value) {
     try {
@@ -115,6 +161,28 @@ class ApiService {
     }
   }
 
+  // Every round of a game session in one request (targets, grid, case variants)
+  static async getDeck(childId, gameMode = 'find-letter') {
+    try {
+      const response = await axios.post(`${API}/children/${childId}/deck`, { game_mode: gameMode });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching deck:', error);
+      throw error;
+    }
+  }
+
+  // Offsets of every clip in the audio sprite (see manage.py build-audio-sprite)
+  static async getAudioSpriteManifest() {
+    try {
+      const response = await axios.get(`${API}/game/audio-sprite/manifest`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching audio sprite manifest:', error);
+      throw error;
+    }
+  }
+
   static async getGraphemeAudio(grapheme) {
     try {
       const response = await axios.get(`${API}/game/audio/${grapheme}`);
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# The backend modules import each other by top-level name (run from backend/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory Motor database (mongomock-motor) per test."""
+    return AsyncMongoMockClient()["betukereso_test"]
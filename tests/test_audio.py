@@ -0,0 +1,116 @@
+"""Range and conditional requests for audio clips (parse_range / audio_response)."""
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from audio import AudioClip, AudioLibrary, audio_response, parse_range
+
+DATA = bytes(range(100))
+CLIP = AudioClip(path=Path("clip.mp3"), size=len(DATA), etag='"64-1"', data=DATA)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=90-500", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=-", None),
+    ("bytes=5-2", None),  # invalid: ignored, whole clip (RFC 9110)
+    ("bytes=0-1,5-6", None),  # multiple ranges: not handled, whole clip
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=-0", 100),
+    ("bytes=0-", 0),
+    ("bytes=-4", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+def _response(clip=CLIP, if_none_match=None, range_header=None, if_range=None):
+    return audio_response(clip, if_none_match, range_header, if_range)
+
+
+def test_full_clip():
+    response = _response()
+    assert response.status_code == 200
+    assert response.body == DATA
+    assert response.headers["etag"] == CLIP.etag
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_not_modified():
+    assert _response(if_none_match=CLIP.etag).status_code == 304
+    assert _response(if_none_match=f'"other", W/{CLIP.etag}').status_code == 304
+    assert _response(if_none_match='"other"').status_code == 200
+
+
+def test_partial_content():
+    response = _response(range_header="bytes=10-19")
+    assert response.status_code == 206
+    assert response.body == DATA[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    assert response.headers["content-length"] == "10"
+
+
+def test_inverted_range_sends_whole_clip():
+    response = _response(range_header="bytes=5-2")
+    assert response.status_code == 200
+    assert response.body == DATA
+
+
+def test_unsatisfiable_range():
+    response = _response(range_header="bytes=100-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+def test_stale_if_range_sends_whole_clip():
+    assert _response(range_header="bytes=0-1", if_range='"stale"').status_code == 200
+    assert _response(range_header="bytes=0-1", if_range=CLIP.etag).status_code == 206
+
+
+def test_empty_clip():
+    empty = AudioClip(path=Path("empty.mp3"), size=0, etag='"0-1"', data=b"")
+    assert _response(empty).status_code == 200
+    response = _response(empty, range_header="bytes=-4")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+
+
+def test_library_metadata_follows_the_bytes(tmp_path):
+    small, other, large = tmp_path / "a.mp3", tmp_path / "c.mp3", tmp_path / "b.mp3"
+    small.write_bytes(b"x" * 10)
+    other.write_bytes(b"c" * 10)
+    large.write_bytes(b"y" * 50)
+
+    async def run():
+        library = AudioLibrary(str(tmp_path), max_clips=1, max_file_bytes=20)
+        first = await library.get("a")
+        assert (first.data, first.size) == (b"x" * 10, 10)
+        # Replaced on disk, then evicted from the LRU: size and ETag come with the new bytes
+        small.write_bytes(b"z" * 15)
+        os.utime(small, ns=(1, 1))
+        await library.get("c")
+        second = await library.get("a")
+        assert (second.data, second.size) == (b"z" * 15, 15)
+        assert second.etag != first.etag
+        # Too big to keep: the open file the metadata was taken from goes to the response
+        clip = await library.get("b")
+        assert clip.data is None and clip.size == 50
+        async with clip.file as file:
+            assert await file.read() == b"y" * 50
+
+    asyncio.run(run())
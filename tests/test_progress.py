@@ -0,0 +1,90 @@
+"""Progress scoring: the update pipeline against its Python mirror, and batches against single taps."""
+import asyncio
+import random
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from models import Child, ChildCreate, GameMode, GameSessionCreate, RECENT_WINDOW
+from services.child_service import ChildService, popcount_expression, progress_update_pipeline, push_recent, stars_for
+from sticker_catalog import popcount
+
+
+def test_popcount_expression_matches_popcount(db):
+    async def run():
+        await db.numbers.insert_many([{"n": n} for n in range(1 << RECENT_WINDOW)])
+        pipeline = [{"$project": {"_id": 0, "n": 1, "bits": popcount_expression("$n")}}]
+        return await db.numbers.aggregate(pipeline).to_list(length=None)
+
+    rows = asyncio.run(run())
+    assert len(rows) == 1 << RECENT_WINDOW
+    for row in rows:
+        assert row["bits"] == popcount(row["n"])
+
+
+def test_pipeline_matches_python_replay(db):
+    rng = random.Random(24)
+    answers = [(rng.choice(["a", "cs"]), rng.random() < 0.7, rng.choice([None, 800, 1500])) for _ in range(60)]
+
+    async def run():
+        child = Child(name="Teszt")
+        await db.children.insert_one(child.model_dump())
+        expected = {}
+        streak = 0
+        for grapheme, is_correct, response_time in answers:
+            doc = await db.children.find_one_and_update(
+                {"id": child.id},
+                progress_update_pipeline(grapheme, is_correct, datetime.utcnow(), response_time),
+                return_document=ReturnDocument.AFTER,
+            )
+            recent, recent_count = expected[grapheme] = push_recent(*expected.get(grapheme, (0, 0)), is_correct)
+            streak = streak + 1 if is_correct else 0
+            progress = doc["progress"][grapheme]
+            assert (progress["recent"], progress["recent_count"]) == (recent, recent_count)
+            assert type(progress["recent"]) is int
+            assert progress["stars"] == stars_for(recent, recent_count)
+            assert doc["streak"] == streak
+
+    asyncio.run(run())
+
+
+def test_recent_window_keeps_only_latest_answers():
+    recent, recent_count = 0, 0
+    for _ in range(RECENT_WINDOW):
+        recent, recent_count = push_recent(recent, recent_count, False)
+    assert stars_for(recent, recent_count) == 0
+    for _ in range(RECENT_WINDOW):
+        recent, recent_count = push_recent(recent, recent_count, True)
+    assert (recent, recent_count) == ((1 << RECENT_WINDOW) - 1, RECENT_WINDOW)
+    assert stars_for(recent, recent_count) == 3
+    assert stars_for(0, 0) == 0
+
+
+def test_batch_matches_single_taps(db):
+    rng = random.Random(3)
+    answers = [
+        GameSessionCreate(
+            game_mode=rng.choice(list(GameMode)),
+            grapheme=rng.choice(["a", "cs", "dzs"]),
+            is_correct=rng.random() < 0.75,
+            response_time=rng.choice([None, 900, 2100]),
+        )
+        for _ in range(80)
+    ]
+
+    async def run():
+        service = ChildService(db)
+        tapped = await service.create_child(ChildCreate(name="Egyenként"))
+        batched = await service.create_child(ChildCreate(name="Egyben"))
+        for child in (tapped, batched):
+            # Which sticker is drawn is random; counters, streak and stars must agree
+            await service.update_child_settings(child.id, "stickers_enabled", False)
+        single = [await service.record_game_session(tapped.id, answer) for answer in answers]
+        batch = await service.record_game_sessions(batched.id, answers[:30]) + await service.record_game_sessions(batched.id, answers[30:])
+        assert [(r.new_streak, r.new_stars) for r in batch] == [(r.new_streak, r.new_stars) for r in single]
+        tapped_doc, batched_doc = [await db.children.find_one({"id": child.id}) for child in (tapped, batched)]
+        assert batched_doc["streak"] == tapped_doc["streak"]
+        assert batched_doc["progress"] == tapped_doc["progress"]
+        assert await db.game_sessions.count_documents({"child_id": batched.id}) == len(answers)
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+"""Snapshot restore: rollups rebuilt from the restored history, and left alone by the backfill."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import migrations
+from models import Child
+from services.archive import encode_block
+from services.child_service import ChildService
+from services.rollups import ensure_live_cutoff
+from services.snapshot import SNAPSHOT_FORMAT, SnapshotRestoreError, restore_snapshot
+
+MONTH = datetime(2025, 1, 1)
+
+
+def _session(i, child_id):
+    return {
+        "id": f"s{i}",
+        "child_id": child_id,
+        "game_mode": "find-letter",
+        "grapheme": ["a", "cs"][i % 2],
+        "is_correct": i % 3 != 0,
+        "response_time": 1000 + i,
+        "timestamp": MONTH + timedelta(days=i, hours=1),
+    }
+
+
+async def _records(child, sessions, archived):
+    graphemes, data = encode_block(archived, MONTH)
+    records = [
+        {"snapshot": SNAPSHOT_FORMAT, "created_at": datetime.utcnow(), "child_ids": [child.id]},
+        {"c": "children", "d": child.model_dump()},
+        *({"c": "game_sessions", "d": session} for session in sessions),
+        {"c": "session_archive", "d": {"child_id": child.id, "month": MONTH, "graphemes": graphemes, "data": data}},
+        # Older snapshots carry rollups: skipped, they are rebuilt instead
+        {"c": "session_rollups", "d": {"child_id": child.id, "day": MONTH, "grapheme": "a",
+                                        "game_mode": "find-letter", "source": "live", "attempts": 99}},
+    ]
+    for record in records:
+        yield record
+
+
+def test_restore_then_backfill_counts_once(db):
+    child = Child(name="Visszaállított")
+    sessions = [_session(i, child.id) for i in range(3)]
+    archived = [{k: v for k, v in _session(i, child.id).items() if k != "id"} for i in range(3, 5)]
+    days = (datetime.utcnow() - MONTH).days + 2
+
+    async def run():
+        # Live rollups started before the restore: the restored sessions are older than the cutoff
+        await ensure_live_cutoff(db)
+        report = await restore_snapshot(db, _records(child, sessions, archived), batch_size=2)
+        assert report["failed_batches"] == 0
+        service = ChildService(db)
+        before = await service.get_child_stats(child.id, days=days)
+        await migrations.backfill_session_rollups(db)
+        service.forget_children([child.id])
+        after = await service.get_child_stats(child.id, days=days)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before.attempts == after.attempts == 5
+    assert before.correct == after.correct == 3
+
+
+def test_bad_record_after_replace_names_the_children(db):
+    child = Child(name="Félbehagyott")
+
+    async def records():
+        yield {"snapshot": SNAPSHOT_FORMAT, "created_at": datetime.utcnow(), "child_ids": [child.id]}
+        yield {"c": "children", "d": child.model_dump()}
+        yield {"c": "stickers", "d": {"child_id": "someone-else"}}
+
+    async def run():
+        await db.children.insert_one(child.model_dump())
+        with pytest.raises(SnapshotRestoreError) as raised:
+            await restore_snapshot(db, records(), replace=True)
+        return raised.value
+
+    error = asyncio.run(run())
+    # The existing child was already deleted: the caller must drop what it cached about it
+    assert error.child_ids == [child.id]
+    assert isinstance(error.__cause__, ValueError)